@@ -0,0 +1,29 @@
+from functools import wraps
+
+from api.views import Favourite, ShoppingList, Subscribe
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+
+def in_thread(func):
+    @wraps(func)
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connections.close_all()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def async_view(view_class):
+    view = in_thread(view_class.as_view())
+
+    async def run(request, *args, **kwargs):
+        return await view(request, *args, **kwargs)
+    run.csrf_exempt = True
+    return run
+
+
+favourite = async_view(Favourite)
+shopping_cart = async_view(ShoppingList)
+subscription = async_view(Subscribe)
@@ -0,0 +1,171 @@
+import hashlib
+import time
+from collections import OrderedDict
+from copy import copy
+from threading import Lock
+
+from api.versions import get_version, touch
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from users.models import User
+
+
+class TokenCache:
+    version_key = 'auth:version:{}'
+    token_key = 'auth:token:{}'
+
+    def __init__(self, max_size, timeout, alias=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.alias = alias
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    @staticmethod
+    def digest(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _count(self, attribute):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def get(self, key):
+        now = time.monotonic()
+        digest = self.digest(key)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+        version = self.version(digest)
+        if entry is not None:
+            expires, token, token_version = entry
+            if token_version == version:
+                self._count('hits')
+                return token
+            with self._lock:
+                self._data.pop(key, None)
+        elif self.shared is not None:
+            cached = self.shared.get(self.token_key.format(digest))
+            if cached is not None:
+                user_id, is_active, token_digest, token_version = cached
+                if token_digest == digest and token_version == version:
+                    token = self._restore(key, user_id, is_active)
+                    self._store(key, token, version)
+                    self._count('shared_hits')
+                    return token
+                self.shared.delete(self.token_key.format(digest))
+        self._count('misses')
+        return None
+
+    @staticmethod
+    def _restore(key, user_id, is_active):
+        user = User.from_db(
+            router.db_for_read(User), ('id', 'is_active'), (user_id, is_active)
+        )
+        token = Token(key=key, user_id=user_id)
+        token.user = user
+        return token
+
+    def set(self, token, version):
+        self._store(token.key, token, version)
+        if self.shared is not None:
+            digest = self.digest(token.key)
+            self.shared.set(
+                self.token_key.format(digest),
+                (token.user_id, token.user.is_active, digest, version),
+                timeout=self.timeout
+            )
+
+    def _store(self, key, token, version):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, token, version)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def version(self, digest):
+        return get_version(self.version_key.format(digest), self.alias)
+
+    def evict_token(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+        touch(self.version_key.format(self.digest(key)), using=self.alias)
+
+    def evict_user(self, user_id):
+        with self._lock:
+            keys = {
+                key for key, (expires, token, version) in self._data.items()
+                if token.user_id == user_id
+            }
+        keys.update(Token.objects.filter(
+            user_id=user_id
+        ).values_list('key', flat=True))
+        for key in keys:
+            self.evict_token(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.shared_hits = 0
+            self.misses = 0
+
+    def stats(self):
+        requests = self.hits + self.shared_hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'timeout': self.timeout,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_ratio': (
+                (self.hits + self.shared_hits) / requests if requests else 0.0
+            ),
+        }
+
+
+def detach(token):
+    token = copy(token)
+    token.user = copy(token.user)
+    return token
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE,
+    settings.TOKEN_CACHE_TIMEOUT,
+    settings.TOKEN_CACHE_ALIAS,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is not None:
+            token = detach(token)
+            return token.user, token
+        version = token_cache.version(token_cache.digest(key))
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user').get(key=key)
+        except model.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        token_cache.set(detach(token), version)
+        return token.user, token
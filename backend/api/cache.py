@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from threading import Lock
+
+from api.versions import get_versions, touch
+from django.conf import settings
+
+RECIPE_USER_FIELDS = (
+    'is_favorited', 'is_in_shopping_cart', 'author_is_subscribed',
+)
+
+
+class RecipeCache:
+    generation_key = 'recipe-cache:generation'
+    list_key = 'recipe-cache:list'
+    recipe_key = 'recipe-cache:recipe:{}'
+    author_key = 'recipe-cache:author:{}'
+    user_key = 'recipe-cache:user:{}'
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def versions(self, rows, user_id=None):
+        keys = [self.generation_key, self.list_key]
+        if user_id is not None:
+            keys.append(self.user_key.format(user_id))
+        for row in rows:
+            keys.append(self.recipe_key.format(row['id']))
+            keys.append(self.author_key.format(row['author_id']))
+        tokens = get_versions(keys)
+        shared = [tokens[self.generation_key], tokens[self.list_key]]
+        if user_id is not None:
+            shared.append(tokens[self.user_key.format(user_id)])
+        return {
+            row['id']: (
+                tokens[self.generation_key],
+                tokens[self.recipe_key.format(row['id'])],
+                tokens[self.author_key.format(row['author_id'])],
+            )
+            for row in rows
+        }, shared
+
+    def get_many(self, versions, prefix):
+        found = {}
+        with self._lock:
+            for pk, version in versions.items():
+                key = (prefix, pk, version)
+                body = self._data.get(key)
+                if body is None:
+                    self.misses += 1
+                    continue
+                self._data.move_to_end(key)
+                self.hits += 1
+                found[pk] = body
+        return found
+
+    def set_many(self, bodies, versions, prefix):
+        with self._lock:
+            for pk, body in bodies.items():
+                key = (prefix, pk, versions[pk])
+                self._data[key] = body
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *recipe_ids):
+        if recipe_ids:
+            touch(self.list_key, *(
+                self.recipe_key.format(pk) for pk in recipe_ids
+            ))
+
+    def invalidate_author(self, author_id):
+        touch(self.author_key.format(author_id))
+
+    def invalidate_user(self, user_id):
+        touch(self.user_key.format(user_id))
+
+    def invalidate_all(self):
+        touch(self.generation_key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+        }
+
+
+def overlay_user_fields(body, row):
+    data = dict(body)
+    data['is_favorited'] = row['is_favorited']
+    data['is_in_shopping_cart'] = row['is_in_shopping_cart']
+    data['author'] = dict(
+        body['author'], is_subscribed=row['author_is_subscribed']
+    )
+    return data
+
+
+recipe_cache = RecipeCache(settings.RECIPE_CACHE_SIZE)
@@ -0,0 +1,30 @@
+import os
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.CACHES['default']['BACKEND'] != settings.LOCAL_CACHE_BACKEND:
+        return []
+    return [Warning(
+        'Кэш по умолчанию хранится в памяти процесса: версии, кэш рецептов '
+        'и токенов не видны другим воркерам',
+        hint='Запускайте один воркер gunicorn или задайте CACHE_BACKEND и '
+             'CACHE_LOCATION общего кэша, например PyMemcacheCache',
+        id='api.W001',
+    )]
+
+
+@register()
+def check_shopping_list_font(app_configs, **kwargs):
+    if os.path.isfile(settings.SHOPPING_LIST_FONT):
+        return []
+    return [Warning(
+        f'Не найден шрифт для PDF-списка покупок: '
+        f'{settings.SHOPPING_LIST_FONT}',
+        hint='Установите fonts-dejavu-core или укажите путь к TTF-шрифту с '
+             'кириллицей в SHOPPING_LIST_FONT',
+        id='api.W002',
+    )]
@@ -0,0 +1,20 @@
+from hashlib import sha1
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    return f'"{sha1(repr(parts).encode()).hexdigest()}"'
+
+
+def not_modified(request, etag, last_modified):
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified)
+    )
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -1,5 +1,9 @@
+from api.versions import TAGS_VERSION, get_version
+from django.conf import settings
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favourite, Ingredient, Recipe, ShoppingList, Tag
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
 
 
@@ -11,17 +15,42 @@ class IngredientFilter(SearchFilter):
         fields = ('name',)
 
 
+class TagSlugs:
+    def __init__(self):
+        self._state = (None, {})
+
+    def ids(self):
+        version = get_version(TAGS_VERSION)
+        state_version, ids = self._state
+        if state_version != version:
+            ids = dict(Tag.objects.values_list('slug', 'id'))
+            self._state = (version, ids)
+        return ids
+
+    def choices(self):
+        return [(slug, slug) for slug in self.ids()]
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+tag_slugs = TagSlugs()
+
+
+class NumberInFilter(rest_framework.BaseInFilter, rest_framework.NumberFilter):
+    pass
+
+
 class RecipeFilter(rest_framework.FilterSet):
-    author = rest_framework.NumberFilter(
-        field_name='author__id',
-        lookup_expr='contains')
-
-    tags = rest_framework.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+    ids = NumberInFilter(method='get_ids')
+    author = rest_framework.NumberFilter(field_name='author_id')
+
+    tags = rest_framework.MultipleChoiceFilter(
+        choices=tag_slugs.choices,
+        method='get_tags'
     )
 
+    search = rest_framework.CharFilter(method='get_search')
     is_favorited = rest_framework.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = rest_framework.BooleanFilter(
         method='get_is_in_shopping_cart'
@@ -29,14 +58,41 @@ class RecipeFilter(rest_framework.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'ids', 'tags', 'author', 'search',
+            'is_favorited', 'is_in_shopping_cart',
+        )
+
+    def get_ids(self, queryset, name, value):
+        if len(value) > settings.BATCH_RECIPES_LIMIT:
+            raise ValidationError({name: [
+                f'Не больше {settings.BATCH_RECIPES_LIMIT} рецептов за запрос'
+            ]})
+        return queryset.filter(pk__in=value)
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        ids = tag_slugs.ids()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag_id__in=[ids[slug] for slug in value]
+        )))
+
+    def get_search(self, queryset, name, value):
+        if value.strip():
+            return queryset.search(value)
+        return queryset
 
     def get_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favourites__user=self.request.user)
+            return queryset.filter(Exists(Favourite.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shopping_lists__user=self.request.user)
+            return queryset.filter(Exists(ShoppingList.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
         return queryset
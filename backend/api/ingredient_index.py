@@ -0,0 +1,70 @@
+from bisect import bisect_left
+from operator import itemgetter
+from threading import Lock, Thread
+
+from api.versions import INGREDIENTS_VERSION, get_version, touch
+from django.db import connection
+from recipes.models import Ingredient
+
+MAX_CHAR = chr(0x10FFFF)
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._state = (None, [], [])
+        self._building = False
+        self._lock = Lock()
+
+    def build(self, version=None):
+        if version is None:
+            version = get_version(INGREDIENTS_VERSION)
+        ingredients = sorted(
+            Ingredient.objects.order_by().values(
+                'id', 'name', 'measurement_unit'
+            ),
+            key=lambda ingredient: ingredient['name'].casefold()
+        )
+        keys = [ingredient['name'].casefold() for ingredient in ingredients]
+        self._state = (version, keys, ingredients)
+
+    def _build_in_background(self, version):
+        try:
+            self.build(version)
+        finally:
+            self._building = False
+            connection.close()
+
+    def _schedule_build(self, version):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        Thread(
+            target=self._build_in_background, args=(version,), daemon=True
+        ).start()
+
+    def search(self, terms):
+        version = get_version(INGREDIENTS_VERSION)
+        index_version, keys, ingredients = self._state
+        if index_version != version:
+            self._schedule_build(version)
+            return None
+        terms = sorted((term.casefold() for term in terms), key=len)
+        if not terms:
+            return sorted(ingredients, key=itemgetter('id'))
+        prefix = terms[-1]
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + MAX_CHAR, start)
+        return sorted(
+            (
+                ingredients[position] for position in range(start, end)
+                if all(keys[position].startswith(term) for term in terms)
+            ),
+            key=itemgetter('id')
+        )
+
+    def invalidate(self):
+        touch(INGREDIENTS_VERSION)
+
+
+ingredient_index = IngredientIndex()
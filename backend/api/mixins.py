@@ -1,7 +1,59 @@
-from rest_framework import mixins, viewsets
+from api.conditional import make_etag, not_modified, set_validators
+from api.versions import get_version
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from rest_framework import mixins, status, viewsets
+from rest_framework.response import Response
 
 
-class OnlyReadViewSet(mixins.RetrieveModelMixin,
+class ValuesReadMixin:
+    values_fields = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_fields is None or not settings.FAST_READ_PATH:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *self.values_fields
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.values_fields is None or not settings.FAST_READ_PATH:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            self.filter_queryset(self.get_queryset()).values(
+                *self.values_fields
+            ),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(request, row)
+        return Response(row)
+
+
+class OnlyReadViewSet(ValuesReadMixin,
+                      mixins.RetrieveModelMixin,
                       mixins.ListModelMixin,
                       viewsets.GenericViewSet):
     pass
+
+
+class VersionedMixin:
+    version_key = None
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        last_modified, nonce = get_version(self.version_key)
+        etag = make_etag(
+            request.build_absolute_uri(),
+            request.accepted_renderer.format,
+            nonce
+        )
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        return set_validators(response, etag, last_modified)
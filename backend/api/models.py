@@ -0,0 +1,25 @@
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import models
+from users.models import User
+
+
+class ImageUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='image_uploads'
+    )
+    offset = models.PositiveBigIntegerField('Загружено байт', default=0)
+    created = models.DateTimeField('Начало загрузки', auto_now_add=True)
+
+    @property
+    def path(self):
+        return Path(settings.IMAGE_UPLOAD_ROOT) / str(self.id)
+
+    def discard(self):
+        self.path.unlink(missing_ok=True)
+        self.delete()
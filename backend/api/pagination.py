@@ -1,6 +1,92 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class IdCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = '-id'
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_pagination_class = IdCursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(CustomPagination):
+    ids_query_param = 'ids'
+
+    def get_page_size(self, request):
+        ids = request.query_params.get(self.ids_query_param)
+        if ids and self.page_size_query_param not in request.query_params:
+            return len(ids.split(','))
+        return super().get_page_size(request)
+
+
+class PantryPagination(PageNumberPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+
+
+class FeedPagination(BasePagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_recipe_ids(self, recipe_ids, request):
+        self.request = request
+        before = request.query_params.get(self.cursor_query_param)
+        if before is not None:
+            try:
+                before = int(before)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            page_size = self.page_size
+        page_size = max(page_size, 1)
+        ids = recipe_ids(request.user.pk, before, page_size + 1)
+        self.next_cursor = ids[page_size - 1] if len(ids) > page_size else None
+        return ids[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
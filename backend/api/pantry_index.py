@@ -0,0 +1,203 @@
+import time
+from itertools import chain
+from threading import Lock, Thread
+
+import numpy as np
+from api.versions import PANTRY_VERSION, get_version, touch
+from django.conf import settings
+from django.db import connection
+from recipes.models import IngredientRecipe, Recipe
+
+MAX_MATCHED = 0xFFFF
+MAX_POSITION = 0xFFFFFFFF
+BITSET_RATIO = 32
+
+
+def _values(queryset, *fields):
+    values = queryset.order_by().values_list(*fields).iterator(
+        chunk_size=10000
+    )
+    return np.fromiter(
+        chain.from_iterable(values), dtype=np.int64
+    ).reshape(-1, len(fields))
+
+
+def _contains(sorted_ids, ids):
+    positions = np.searchsorted(sorted_ids, ids)
+    found = positions < len(sorted_ids)
+    found[found] = sorted_ids[positions[found]] == ids[found]
+    return found
+
+
+class Postings:
+    def __init__(self, keys, rows, size):
+        order = np.lexsort((rows, keys))
+        self.size = size
+        self.keys, starts = np.unique(keys[order], return_index=True)
+        rows = rows[order].astype(np.int32)
+        self.postings = [
+            self._compact(posting) for posting in np.split(rows, starts[1:])
+        ]
+
+    def _compact(self, posting):
+        if len(posting) * BITSET_RATIO < self.size:
+            return posting.copy()
+        bits = np.zeros(self.size, dtype=bool)
+        bits[posting] = True
+        return np.packbits(bits)
+
+    def _get(self, keys):
+        positions = np.searchsorted(self.keys, keys)
+        for key, position in zip(keys, positions):
+            if position < len(self.keys) and self.keys[position] == key:
+                posting = self.postings[position]
+                if posting.dtype == np.uint8:
+                    yield np.unpackbits(posting, count=self.size), None
+                else:
+                    yield None, posting
+
+    def count(self, keys):
+        counts = np.zeros(self.size, dtype=np.uint16)
+        for bits, posting in self._get(keys):
+            if posting is None:
+                counts += bits
+            else:
+                counts[posting] += 1
+        return counts
+
+    def mask(self, keys):
+        found = np.zeros(self.size, dtype=bool)
+        for bits, posting in self._get(keys):
+            if posting is None:
+                found |= bits.view(bool)
+            else:
+                found[posting] = True
+        return found
+
+
+class PantryMatches:
+    def __init__(self, recipe_ids, keys):
+        self.recipe_ids = recipe_ids
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, index):
+        stop = min(index.stop, len(self.keys))
+        if stop < len(self.keys):
+            best = np.argpartition(self.keys, stop - 1)[:stop]
+        else:
+            best = np.arange(stop)
+        keys = np.sort(self.keys[best])[index.start or 0:]
+        recipe_ids = self.recipe_ids[MAX_POSITION - (keys & MAX_POSITION)]
+        return [
+            {
+                'id': recipe_id,
+                'matched': MAX_MATCHED - ((key >> 32) & MAX_MATCHED),
+                'missing': key >> 48,
+            }
+            for recipe_id, key in zip(recipe_ids.tolist(), keys.tolist())
+        ]
+
+
+class PantrySnapshot:
+    def __init__(self, version, recipe_ids, cooking_times, sizes,
+                 ingredients, tags):
+        self.version = version
+        self.recipe_ids = recipe_ids
+        self.cooking_times = cooking_times
+        self.sizes = sizes
+        self.ingredients = ingredients
+        self.tags = tags
+
+    @classmethod
+    def load(cls, version):
+        recipes = _values(Recipe.objects.all(), 'id', 'cooking_time')
+        recipes = recipes[np.argsort(recipes[:, 0])]
+        recipe_ids = recipes[:, 0]
+        ingredient_rows, ingredient_ids = cls._rows(recipe_ids, _values(
+            IngredientRecipe.objects.all(), 'recipe_id', 'ingredient_id'
+        ))
+        tag_rows, tag_ids = cls._rows(recipe_ids, _values(
+            Recipe.tags.through.objects.all(), 'recipe_id', 'tag_id'
+        ))
+        return cls(
+            version,
+            recipe_ids,
+            recipes[:, 1],
+            np.bincount(ingredient_rows, minlength=len(recipe_ids)),
+            Postings(ingredient_ids, ingredient_rows, len(recipe_ids)),
+            Postings(tag_ids, tag_rows, len(recipe_ids)),
+        )
+
+    @staticmethod
+    def _rows(recipe_ids, pairs):
+        known = _contains(recipe_ids, pairs[:, 0])
+        return np.searchsorted(recipe_ids, pairs[known, 0]), pairs[known, 1]
+
+    def match(self, ingredient_ids, tag_ids=(), cooking_time=None):
+        counts = self.ingredients.count(np.unique(ingredient_ids))
+        keep = counts > 0
+        if cooking_time is not None:
+            keep &= self.cooking_times <= cooking_time
+        if tag_ids:
+            keep &= self.tags.mask(np.unique(tag_ids))
+        rows = np.flatnonzero(keep)
+        matched = counts[rows].astype(np.int64)
+        missing = self.sizes[rows] - matched
+        return PantryMatches(self.recipe_ids, (
+            missing.astype(np.uint64) << np.uint64(48)
+            | (MAX_MATCHED - matched).astype(np.uint64) << np.uint64(32)
+            | (MAX_POSITION - rows).astype(np.uint64)
+        ))
+
+
+class PantryIndex:
+    def __init__(self):
+        self._snapshot = None
+        self._building = False
+        self._scheduled_at = None
+        self._lock = Lock()
+
+    def build(self, version=None):
+        if version is None:
+            version = get_version(PANTRY_VERSION)
+        self._snapshot = PantrySnapshot.load(version)
+
+    def _build_in_background(self, version):
+        try:
+            self.build(version)
+        finally:
+            self._building = False
+            connection.close()
+
+    def _schedule_build(self, version):
+        now = time.monotonic()
+        with self._lock:
+            if self._building or (
+                self._snapshot is not None
+                and self._scheduled_at is not None
+                and now - self._scheduled_at < settings.PANTRY_REBUILD_INTERVAL
+            ):
+                return
+            self._building = True
+            self._scheduled_at = now
+        Thread(
+            target=self._build_in_background, args=(version,), daemon=True
+        ).start()
+
+    def search(self, ingredient_ids, tag_ids=(), cooking_time=None):
+        version = get_version(PANTRY_VERSION)
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != version:
+            self._schedule_build(version)
+        if snapshot is None:
+            return None
+        return snapshot.match(ingredient_ids, tag_ids, cooking_time)
+
+    def invalidate(self):
+        touch(PANTRY_VERSION)
+
+
+pantry_index = PantryIndex()
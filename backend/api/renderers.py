@@ -0,0 +1,130 @@
+import csv
+from abc import ABC, abstractmethod
+from io import BytesIO
+
+import orjson
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(
+                    accepted_media_type, renderer_context or {}
+                ) is not None):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        content = orjson.dumps(
+            data, default=self.encoder_class().default, option=self.options
+        )
+        return content.replace('\u2028'.encode(), b'\\u2028').replace(
+            '\u2029'.encode(), b'\\u2029'
+        )
+
+
+class ShoppingListRenderer(ABC, BaseRenderer):
+    charset = 'utf-8'
+    title = 'Список покупок'
+    streaming = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''
+
+    @abstractmethod
+    def stream(self, ingredients):
+        pass
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield f'{self.title}: '.encode()
+        for number, ingredient in enumerate(ingredients):
+            separator = '\n' if number else ''
+            yield (
+                f'{separator}\n{ingredient["ingredient__name"]} '
+                f'({ingredient["ingredient__measurement_unit"]})'
+                f' — {ingredient["amount"]}'
+            ).encode()
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')
+        ).encode()
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['ingredient__name'],
+                ingredient['ingredient__measurement_unit'],
+                ingredient['amount'],
+            )).encode()
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    streaming = False
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    line_height = 18
+    margin = 50
+
+    def _font(self):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            try:
+                pdfmetrics.registerFont(
+                    TTFont(self.font_name, settings.SHOPPING_LIST_FONT)
+                )
+            except (OSError, TTFError) as error:
+                raise ImproperlyConfigured(
+                    f'Не удалось загрузить шрифт для PDF-списка покупок '
+                    f'{settings.SHOPPING_LIST_FONT}: {error}'
+                )
+        return self.font_name
+
+    def stream(self, ingredients):
+        buffer = BytesIO()
+        font = self._font()
+        width, height = A4
+        pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+        pdf.setTitle(self.title)
+        pdf.setFont(font, self.font_size + 4)
+        pdf.drawString(self.margin, height - self.margin, self.title)
+        y = height - self.margin - 2 * self.line_height
+        pdf.setFont(font, self.font_size)
+        for ingredient in ingredients:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(font, self.font_size)
+                y = height - self.margin
+            pdf.drawString(
+                self.margin, y,
+                f'{ingredient["ingredient__name"]} '
+                f'({ingredient["ingredient__measurement_unit"]})'
+                f' — {ingredient["amount"]}'
+            )
+            y -= self.line_height
+        pdf.save()
+        yield buffer.getvalue()
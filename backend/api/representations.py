@@ -0,0 +1,122 @@
+from collections import defaultdict
+
+from django.conf import settings
+from recipes.models import IngredientRecipe, Recipe, RecipeImage
+
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+SUBSCRIPTION_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'recipes_count',
+)
+
+
+class ImageUrls:
+    recipe_storage = Recipe._meta.get_field('image').storage
+    variant_storage = RecipeImage._meta.get_field('image').storage
+
+    def __init__(self, request, recipe_ids, kind, image_format=None):
+        self.request = request
+        self.variants = {
+            recipe_id: (source, image)
+            for recipe_id, source, image in RecipeImage.objects.filter(
+                recipe_id__in=recipe_ids,
+                kind=kind,
+                format=image_format or settings.RECIPE_IMAGE_FORMAT
+            ).values_list('recipe_id', 'source', 'image')
+        }
+
+    def get(self, recipe_id, image):
+        source, variant = self.variants.get(recipe_id, (None, None))
+        if variant and source == image:
+            url = self.variant_storage.url(variant)
+        elif image:
+            url = self.recipe_storage.url(image)
+        else:
+            return None
+        if self.request is None:
+            return url
+        return self.request.build_absolute_uri(url)
+
+
+def recipe_bodies(recipe_ids, request, image_kind=None, image_format=None):
+    recipes = Recipe.objects.filter(pk__in=recipe_ids).order_by().values(
+        'id', 'name', 'image', 'text', 'cooking_time',
+        *(f'author__{field}' for field in AUTHOR_FIELDS)
+    )
+    tags = defaultdict(list)
+    for recipe_id, *tag in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag_id').values_list(
+        'recipe_id', *(f'tag__{field}' for field in TAG_FIELDS)
+    ):
+        tags[recipe_id].append(dict(zip(TAG_FIELDS, tag)))
+    ingredients = defaultdict(list)
+    for recipe_id, *ingredient, amount in IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values_list(
+        'recipe_id',
+        *(f'ingredient__{field}' for field in INGREDIENT_FIELDS),
+        'amount'
+    ):
+        ingredients[recipe_id].append(
+            dict(zip(INGREDIENT_FIELDS, ingredient), amount=amount)
+        )
+    images = ImageUrls(
+        request, recipe_ids, image_kind or RecipeImage.DETAIL, image_format
+    )
+    return {
+        recipe['id']: {
+            'id': recipe['id'],
+            'tags': tags[recipe['id']],
+            'author': dict(
+                {
+                    field: recipe[f'author__{field}']
+                    for field in AUTHOR_FIELDS
+                },
+                is_subscribed=False
+            ),
+            'ingredients': ingredients[recipe['id']],
+            'name': recipe['name'],
+            'image': images.get(recipe['id'], recipe['image']),
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+        }
+        for recipe in recipes
+    }
+
+
+def subscription_bodies(authors, request, recipes_limit=None):
+    author_ids = [author['id'] for author in authors]
+    queryset = Recipe.objects.filter(author__in=author_ids).order_by('-id')
+    if recipes_limit is not None:
+        queryset = queryset.limit_per_author(recipes_limit)
+    recipes = list(queryset.values(
+        'id', 'author_id', 'name', 'image', 'cooking_time'
+    ))
+    images = ImageUrls(
+        request, [recipe['id'] for recipe in recipes], RecipeImage.CARD
+    )
+    by_author = defaultdict(list)
+    for recipe in recipes:
+        by_author[recipe['author_id']].append({
+            'id': recipe['id'],
+            'name': recipe['name'],
+            'image': images.get(recipe['id'], recipe['image']),
+            'cooking_time': recipe['cooking_time'],
+        })
+    return [
+        {
+            'id': author['id'],
+            'email': author['email'],
+            'username': author['username'],
+            'first_name': author['first_name'],
+            'last_name': author['last_name'],
+            'recipes': by_author[author['id']],
+            'is_subscribed': True,
+            'recipes_count': author['recipes_count'],
+        }
+        for author in authors
+    ]
@@ -1,15 +1,27 @@
+import uuid
+
 import webcolors
 
-from django.shortcuts import get_object_or_404
+from api.filters import tag_slugs
+from api.models import ImageUpload
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connection, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import Http404
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from PIL import Image, UnidentifiedImageError
 from recipes.models import (
     Favourite,
     Ingredient,
     IngredientRecipe,
     Recipe,
+    RecipeImage,
+    ShoppingCartIngredient,
     ShoppingList,
     Tag,
+    recipes_created,
 )
 from rest_framework import serializers
 from users.models import Follow, User
@@ -27,6 +39,70 @@ class Hex2NameColor(serializers.Field):
         return data
 
 
+class RecipeImageField(serializers.ReadOnlyField):
+    def __init__(self, kind=RecipeImage.CARD, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+        self.kind = kind
+
+    def to_representation(self, recipe):
+        image = recipe.get_image(
+            self.context.get('image_kind', self.kind),
+            self.context.get('image_format', settings.RECIPE_IMAGE_FORMAT)
+        )
+        if not image:
+            return None
+        request = self.context.get('request')
+        if request is None:
+            return image.url
+        return request.build_absolute_uri(image.url)
+
+
+class RecipeImageUploadField(Base64ImageField):
+    upload_prefix = 'upload:'
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith(self.upload_prefix):
+            return self._from_upload(data[len(self.upload_prefix):])
+        if isinstance(data, UploadedFile):
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
+
+    def _from_upload(self, token):
+        try:
+            upload = ImageUpload.objects.get(
+                pk=uuid.UUID(token), user=self.context['request'].user
+            )
+        except (ValueError, ImageUpload.DoesNotExist):
+            raise serializers.ValidationError('Загрузка не найдена')
+        try:
+            with Image.open(upload.path) as image:
+                extension = (image.format or '').lower()
+        except (OSError, UnidentifiedImageError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        file = UploadedFile(
+            open(upload.path, 'rb'),
+            name=f'{upload.id}.{extension}',
+            size=upload.offset
+        )
+        try:
+            file = serializers.ImageField.to_internal_value(self, file)
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.upload = upload
+        return file
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'offset')
+
+
 class UserCreateSerializer(UserCreateSerializer):
 
     class Meta:
@@ -51,6 +127,8 @@ class UserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -58,6 +136,7 @@ class UserSerializer(UserSerializer):
 
 
 class FollowRecipeSerializer(serializers.ModelSerializer):
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -67,7 +146,6 @@ class FollowRecipeSerializer(serializers.ModelSerializer):
 class FollowSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta(UserSerializer.Meta):
         fields = (
@@ -77,13 +155,14 @@ class FollowSerializer(UserSerializer):
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return user.follower.filter(author=obj).exists()
+        return True
 
     def get_recipes(self, obj):
         request = self.context.get('request')
         recipes_limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
+        recipes = obj.recipes.order_by('-id')
+        if 'recipes' in getattr(obj, '_prefetched_objects_cache', {}):
+            recipes = obj.recipes.all()
         if recipes_limit:
             recipes = recipes[:int(recipes_limit)]
         serializer = FollowRecipeSerializer(
@@ -91,9 +170,6 @@ class FollowSerializer(UserSerializer):
                 'request': request})
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def validate(self, data):
         if Follow.objects.filter(
             author=self.instance,
@@ -145,6 +221,7 @@ class ReadOnlyRecipeSerializer(serializers.ModelSerializer):
     )
     tags = TagSerializer(read_only=False, many=True)
     author = UserSerializer()
+    image = RecipeImageField(kind=RecipeImage.DETAIL)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
 
@@ -157,7 +234,14 @@ class ReadOnlyRecipeSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('author',)
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             raise serializers.ValidationError(
@@ -166,6 +250,8 @@ class ReadOnlyRecipeSerializer(serializers.ModelSerializer):
         return user.favourites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             raise serializers.ValidationError(
@@ -174,8 +260,75 @@ class ReadOnlyRecipeSerializer(serializers.ModelSerializer):
         return user.shopping_lists.filter(recipe=obj).exists()
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        recipes = super().to_internal_value(data)
+        known = set(Ingredient.objects.filter(id__in={
+            ingredient['ingredient']['id']
+            for recipe in recipes for ingredient in recipe['ingredients']
+        }).values_list('id', flat=True))
+        errors = [
+            {'ingredients': ['Ингредиент не найден']}
+            if any(
+                ingredient['ingredient']['id'] not in known
+                for ingredient in recipe['ingredients']
+            ) else {}
+            for recipe in recipes
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return recipes
+
+    @transaction.atomic
+    def create(self, validated_data):
+        tags = [recipe.pop('tags') for recipe in validated_data]
+        ingredients = [recipe.pop('ingredients') for recipe in validated_data]
+        images = [recipe.get('image') for recipe in validated_data]
+        recipes = [Recipe(**recipe) for recipe in validated_data]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+            recipes_created.send(sender=Recipe, recipes=recipes)
+        else:
+            for recipe in recipes:
+                recipe.save()
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+            for recipe, recipe_tags in zip(recipes, tags)
+            for tag in recipe_tags
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe_id=recipe.pk,
+                ingredient_id=ingredient['ingredient']['id'],
+                amount=ingredient['amount']
+            )
+            for recipe, recipe_ingredients in zip(recipes, ingredients)
+            for ingredient in recipe_ingredients
+        )
+        for image in images:
+            self.child._discard_upload(image)
+        return recipes
+
+    def to_representation(self, data):
+        prefetch_related_objects(
+            data,
+            'tags',
+            Prefetch(
+                'ingredientrecipes',
+                queryset=IngredientRecipe.objects.select_related('ingredient')
+            ),
+            'image_variants',
+        )
+        for recipe in data:
+            recipe.is_favorited = False
+            recipe.is_in_shopping_cart = False
+            recipe.author_is_subscribed = False
+        context = {'request': self.context.get('request')}
+        return ReadOnlyRecipeSerializer(data, many=True, context=context).data
+
+
 class RecipeWriteSerializer(serializers.ModelSerializer):
-    image = Base64ImageField(required=True)
+    image = RecipeImageUploadField(required=True)
     ingredients = IngredientRecipeSerializer(many=True)
     tags = serializers.SlugRelatedField(
         slug_field='id',
@@ -191,40 +344,91 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         )
         model = Recipe
         read_only_fields = ('author',)
-
-    def _create_ingredient_recipe_objects(self, ingredients, recipe):
-
-        for ingredient in ingredients:
-            ingredient_amount = ingredient.pop('amount')
-            ingredient_obj = get_object_or_404(
-                Ingredient, id=ingredient['ingredient']['id']
+        list_serializer_class = RecipeListSerializer
+
+    def _set_ingredient_recipe_objects(self, ingredients, recipe):
+        amounts = {
+            ingredient['ingredient']['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        if Ingredient.objects.filter(id__in=amounts).count() != len(amounts):
+            raise Http404('Ингредиент не найден')
+        existing = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in recipe.ingredientrecipes.all()
+        }
+        changes = dict(amounts)
+        for ingredient_id, ingredient_recipe in existing.items():
+            changes[ingredient_id] = (
+                amounts.get(ingredient_id, 0) - ingredient_recipe.amount
             )
-            IngredientRecipe.objects.get_or_create(
+        to_update = []
+        for ingredient_id, ingredient_recipe in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and ingredient_recipe.amount != amount:
+                ingredient_recipe.amount = amount
+                to_update.append(ingredient_recipe)
+        to_delete = [
+            ingredient_id for ingredient_id in existing
+            if ingredient_id not in amounts
+        ]
+        if to_delete:
+            recipe.ingredientrecipes.filter(
+                ingredient_id__in=to_delete
+            ).delete()
+        if to_update:
+            IngredientRecipe.objects.bulk_update(to_update, ('amount',))
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
                 recipe=recipe,
-                ingredient=ingredient_obj,
-                amount=ingredient_amount
+                ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        )
+        if existing:
+            ShoppingCartIngredient.objects.apply_amounts(
+                recipe.shopping_lists.values_list('user_id', flat=True),
+                changes
             )
-            recipe.ingredients.add(ingredient_obj)
         return recipe
 
+    @staticmethod
+    def _discard_upload(image):
+        upload = getattr(image, 'upload', None)
+        if upload is not None:
+            image.close()
+            transaction.on_commit(upload.discard)
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        return self._create_ingredient_recipe_objects(ingredients, recipe)
+        self._discard_upload(validated_data.get('image'))
+        return self._set_ingredient_recipe_objects(ingredients, recipe)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         instance = super().update(instance, validated_data)
-        instance.tags.clear()
+        self._discard_upload(validated_data.get('image'))
         instance.tags.set(tags)
-        instance.ingredients.clear()
-        self._create_ingredient_recipe_objects(ingredients, recipe=instance)
+        self._set_ingredient_recipe_objects(ingredients, recipe=instance)
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'ingredientrecipes',
+                queryset=IngredientRecipe.objects.select_related('ingredient')
+            ),
+        )
         context = {'request': self.context.get('request')}
         return ReadOnlyRecipeSerializer(instance, context=context).data
 
@@ -243,46 +447,59 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         if not value:
             raise serializers.ValidationError(
                 'Добавьте хотя бы один ингредиент')
+        ids = [ingredient['ingredient']['id'] for ingredient in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться')
         return value
 
 
 class FavouriteSerializer(serializers.ModelSerializer):
     name = serializers.ReadOnlyField()
     cooking_time = serializers.ReadOnlyField()
-    image = serializers.SerializerMethodField()
+    image = RecipeImageField()
+
+    duplicate_message = 'Вы уже добавили этот рецепт в избранное'
 
     class Meta:
         model = Favourite
         fields = ('id', 'name', 'image', 'cooking_time')
 
-    def get_image(self, obj):
-        request = self.context.get('request')
-        return request.build_absolute_uri(obj.image.url)
-
-    def validate(self, data):
-        user = self.context.get('request').user
-        if user.favourites.filter(recipe=self.instance).exists():
-            raise serializers.ValidationError(
-                'Вы уже добавили этот рецепт в избранное')
-        return data
-
 
 class ShoppingListSerializer(serializers.ModelSerializer):
     name = serializers.ReadOnlyField()
-    image = serializers.SerializerMethodField()
+    image = RecipeImageField()
     cooking_time = serializers.ReadOnlyField()
 
+    duplicate_message = 'Вы уже добавили этот рецепт в cписок покупок'
+
     class Meta:
         model = ShoppingList
         fields = ('id', 'name', 'image', 'cooking_time')
 
-    def get_image(self, obj):
-        request = self.context.get('request')
-        return request.build_absolute_uri(obj.image.url)
 
-    def validate(self, data):
-        user = self.context.get('request').user
-        if user.shopping_lists.filter(recipe=self.instance).exists():
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_RECIPES_LIMIT
+    )
+
+
+class PantrySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.PANTRY_INGREDIENTS_LIMIT
+    )
+    tags = serializers.ListField(child=serializers.SlugField(), default=list)
+    cooking_time = serializers.IntegerField(min_value=1, default=None)
+
+    def validate_tags(self, value):
+        ids = tag_slugs.ids()
+        unknown = [slug for slug in value if slug not in ids]
+        if unknown:
             raise serializers.ValidationError(
-                'Вы уже добавили этот рецепт в cписок покупок')
-        return data
+                f'Неизвестные теги: {", ".join(unknown)}'
+            )
+        return [ids[slug] for slug in value]
@@ -0,0 +1,119 @@
+from api.authentication import token_cache
+from api.cache import recipe_cache
+from api.ingredient_index import ingredient_index
+from api.pantry_index import pantry_index
+from api.versions import TAGS_VERSION, touch
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import (
+    Favourite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    RecipeImage,
+    ShoppingList,
+    Tag,
+    recipes_created,
+    user_recipes_changed,
+)
+from rest_framework.authtoken.models import Token
+from users.models import Follow, User
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+CREDENTIAL_FIELDS = {'password', 'is_active'}
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    recipe_cache.invalidate(instance.pk)
+
+
+@receiver(recipes_created, sender=Recipe)
+def invalidate_created_recipes(sender, recipes, **kwargs):
+    recipe_cache.invalidate(*(recipe.pk for recipe in recipes))
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+@receiver((post_save, post_delete), sender=RecipeImage)
+def invalidate_recipe_parts(sender, instance, **kwargs):
+    recipe_cache.invalidate(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipe_cache.invalidate(instance.pk)
+    elif pk_set:
+        recipe_cache.invalidate(*pk_set)
+    else:
+        recipe_cache.invalidate_all()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_catalogue(sender, **kwargs):
+    recipe_cache.invalidate_all()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    touch(TAGS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+@receiver(recipes_created, sender=Recipe)
+def invalidate_pantry_index(sender, **kwargs):
+    pantry_index.invalidate()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_pantry_tags(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        pantry_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Favourite)
+@receiver((post_save, post_delete), sender=ShoppingList)
+@receiver((post_save, post_delete), sender=Follow)
+def invalidate_user_flags(sender, instance, **kwargs):
+    recipe_cache.invalidate_user(instance.user_id)
+
+
+@receiver(user_recipes_changed, sender=Favourite)
+@receiver(user_recipes_changed, sender=ShoppingList)
+def invalidate_changed_user_flags(sender, user_id, **kwargs):
+    recipe_cache.invalidate_user(user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    recipe_cache.invalidate_author(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def evict_token(sender, instance, **kwargs):
+    token_cache.evict_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def evict_user_tokens(sender, instance, update_fields=None, **kwargs):
+    if (update_fields is not None
+            and not CREDENTIAL_FIELDS & set(update_fields)):
+        return
+    token_cache.evict_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def evict_deleted_user_tokens(sender, instance, **kwargs):
+    token_cache.evict_user(instance.pk)
@@ -0,0 +1,956 @@
+import base64
+import json
+import re
+from io import BytesIO
+from itertools import combinations
+from unittest import mock
+
+from api import async_views, checks
+from api.authentication import (
+    CachedTokenAuthentication,
+    TokenCache,
+    token_cache,
+)
+from api.cache import recipe_cache
+from api.filters import IngredientFilter
+from api.ingredient_index import ingredient_index
+from api.pantry_index import PantryIndex
+from api.renderers import ORJSONRenderer, PDFShoppingListRenderer
+from api.representations import INGREDIENT_FIELDS
+from api.versions import new_version
+from api.views import Favourite as FavouriteView
+from api.views import IngredientViewSet, RecipeViewSet, Subscribe
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from recipes.models import (
+    Favourite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    RecipeImage,
+    ShoppingList,
+    SimilarRecipe,
+    Tag,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from users.models import Follow, User
+
+
+class CacheResetMixin:
+    def setUp(self):
+        super().setUp()
+        self.reset_caches()
+
+    @staticmethod
+    def reset_caches():
+        cache.clear()
+        recipe_cache.clear()
+        token_cache.clear()
+
+
+def worker_caches(location='shared'):
+    return LocMemCache(location, {}), LocMemCache(location, {})
+
+
+def png_data():
+    buffer = BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+class RecipeListQueriesTest(CacheResetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.user,
+                name=f'Рецепт {number}',
+                text='Текст',
+                cooking_time=10
+            )
+            recipe.tags.add(tag)
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for limit in (1, 2):
+            with self.subTest(limit=limit):
+                self.reset_caches()
+                with self.assertNumQueries(6):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': limit}
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), limit)
+
+
+class RecipeWriteQueriesTest(CacheResetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(26)
+        ]
+        cls.image = png_data()
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def payload(self, ingredients, amount):
+        return {
+            'tags': [self.tag.pk],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient in ingredients
+            ],
+            'name': 'Рецепт',
+            'text': 'Текст',
+            'cooking_time': 10,
+        }
+
+    def queries(self, method, path, data):
+        self.reset_caches()
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(path, data, format='json')
+        self.assertLess(response.status_code, 300, response.content)
+        return response, len(context)
+
+    def write(self, size):
+        response, created = self.queries(
+            'post', '/api/recipes/',
+            dict(self.payload(self.ingredients[:size], 1), image=self.image)
+        )
+        recipe_id = response.json()['id']
+        self.client.post(f'/api/recipes/{recipe_id}/shopping_cart/')
+        response, updated = self.queries(
+            'patch', f'/api/recipes/{recipe_id}/',
+            self.payload(self.ingredients[1:size + 1], 2)
+        )
+        self.assertEqual(len(response.json()['ingredients']), size)
+        return created, updated
+
+    def test_query_count_does_not_depend_on_ingredient_count(self):
+        self.assertEqual(self.write(2), self.write(25))
+
+
+class CursorPaginationTest(CacheResetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        for number in range(12):
+            author = User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                password='password'
+            )
+            Follow.objects.create(user=cls.user, author=author)
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Текст',
+                cooking_time=10
+            )
+            recipe.tags.add(tag)
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def pages(self, path):
+        url = f'{path}?cursor=&limit=2'
+        while url:
+            self.reset_caches()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            yield data['results'], context.captured_queries
+            url = data['next']
+
+    def test_deep_pages_run_the_same_queries(self):
+        for path, queryset in (
+            ('/api/recipes/', Recipe.objects.all()),
+            ('/api/users/subscriptions/', User.objects.filter(
+                following__user=self.user
+            )),
+        ):
+            with self.subTest(path=path):
+                pages = list(self.pages(path))
+                self.assertEqual(len(pages), 6)
+                self.assertEqual(
+                    [item['id'] for results, _ in pages for item in results],
+                    list(queryset.order_by('-id').values_list(
+                        'id', flat=True
+                    ))
+                )
+                counts = {len(queries) for _, queries in pages}
+                self.assertEqual(len(counts), 1)
+                for _, queries in pages:
+                    for query in queries:
+                        self.assertNotIn('COUNT(', query['sql'])
+                        self.assertNotIn(' OFFSET ', query['sql'])
+
+    def test_deep_recipe_page_uses_the_primary_key(self):
+        *_, (_, queries) = self.pages('/api/recipes/')
+        table = Recipe._meta.db_table
+        sql = next(
+            query['sql'] for query in queries
+            if f'FROM "{table}"' in query['sql'] and 'LIMIT' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                nodes = [json.loads(cursor.fetchone()[0])[0]['Plan']]
+                plan = []
+                while nodes:
+                    node = nodes.pop()
+                    plan.append(
+                        f"{node['Node Type']} {node.get('Relation Name')}"
+                    )
+                    nodes.extend(node.get('Plans', ()))
+                self.assertNotIn(f'Seq Scan {table}', plan)
+                self.assertNotIn('Sort None', plan)
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+                self.assertIn(
+                    f'SEARCH {table} USING INTEGER PRIMARY KEY (rowid<?)',
+                    plan
+                )
+                self.assertFalse(any(SQLITE_SORT in line for line in plan))
+
+
+class IngredientIndexTest(CacheResetMixin, TestCase):
+    NAMES = (
+        'Соль', 'Соль морская', 'Сахар', 'Сахарная пудра', 'Ёжевика',
+        'Apple', 'apple juice', 'Pineapple', 'Яблоко',
+    )
+    QUERIES = [
+        '', 'С', 'Са', 'Сахар', 'Сахарная пу', 'Сахарная, пудра', 'пудра',
+        'оль', 'Ё', 'apple', 'APP', 'ple', 'app juice', 'juice', 'Яб',
+        'Яблоко зелёное', 'зз',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in cls.NAMES:
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        super().setUp()
+        ingredient_index.build()
+        self.view = IngredientViewSet()
+        self.factory = APIRequestFactory()
+
+    def test_index_matches_the_database_filter(self):
+        queries = list(self.QUERIES)
+        if connection.vendor == 'postgresql':
+            # LIKE в SQLite не различает регистр только для ASCII.
+            queries += ['сахар', 'СОЛЬ', 'ёж', 'яблоко']
+        for query in queries:
+            with self.subTest(query=query):
+                request = Request(
+                    self.factory.get('/api/ingredients/', {'name': query})
+                )
+                indexed = ingredient_index.search(
+                    IngredientFilter().get_search_terms(request)
+                )
+                self.assertIsNotNone(indexed)
+                self.assertEqual(indexed, list(
+                    IngredientFilter().filter_queryset(
+                        request, Ingredient.objects.all(), self.view
+                    ).order_by('id').values(*INGREDIENT_FIELDS)
+                ))
+
+
+class RecipeBulkTest(CacheResetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        cls.image = png_data()
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recipe(self, **fields):
+        return dict({
+            'tags': [self.tag.pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 5}],
+            'name': 'Рецепт',
+            'text': 'Текст',
+            'cooking_time': 10,
+            'image': self.image,
+        }, **fields)
+
+    def bulk(self, recipes):
+        return self.client.post('/api/recipes/bulk/', recipes, format='json')
+
+    def test_valid_batch_is_created(self):
+        response = self.bulk([self.recipe(name='Суп'), self.recipe()])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [recipe['name'] for recipe in response.json()], ['Суп', 'Рецепт']
+        )
+        self.assertEqual(Recipe.objects.filter(author=self.user).count(), 2)
+
+    def test_invalid_items_fail_the_whole_batch(self):
+        for recipes, errors in (
+            (
+                [self.recipe(), self.recipe(cooking_time=0), self.recipe()],
+                [[], ['cooking_time'], []],
+            ),
+            (
+                [self.recipe(), self.recipe(ingredients=[
+                    {'id': self.ingredient.pk + 1, 'amount': 5}
+                ])],
+                [[], ['ingredients']],
+            ),
+            (
+                [self.recipe(name=''), self.recipe(tags=[])],
+                [['name'], ['tags']],
+            ),
+        ):
+            with self.subTest(errors=errors):
+                response = self.bulk(recipes)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    [list(item) for item in response.json()], errors
+                )
+                self.assertFalse(Recipe.objects.exists())
+
+    def test_unknown_ingredient_error(self):
+        response = self.bulk([self.recipe(ingredients=[
+            {'id': self.ingredient.pk + 1, 'amount': 5}
+        ])])
+        self.assertEqual(
+            response.json(), [{'ingredients': ['Ингредиент не найден']}]
+        )
+
+    @override_settings(BATCH_RECIPES_LIMIT=2)
+    def test_batch_size_is_limited(self):
+        for recipes in ([], [self.recipe()] * 3):
+            with self.subTest(size=len(recipes)):
+                response = self.bulk(recipes)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(set(response.json()), {'non_field_errors'})
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_anonymous_user_is_rejected(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.bulk([self.recipe()]).status_code, 401)
+
+
+class RecipeLookupTest(CacheResetMixin, TestCase):
+    def test_non_numeric_pk_is_not_found(self):
+        response = APIClient().get('/api/recipes/abc/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_non_numeric_pk_has_no_similar_recipes(self):
+        response = APIClient().get('/api/recipes/abc/similar/')
+        self.assertEqual(response.status_code, 404)
+
+
+class TokenCacheTest(CacheResetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.key = self.client.post('/api/auth/token/login/', {
+            'email': 'cook@example.com', 'password': 'password'
+        }).json()['auth_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+    def me(self):
+        return self.client.get('/api/users/me/')
+
+    def test_logout_revokes_token_cached_by_other_workers(self):
+        self.assertEqual(self.me().status_code, 200)
+        other_worker = dict(token_cache._data)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        token_cache._data.update(other_worker)
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_revocation_during_lookup_is_not_cached(self):
+        digest = token_cache.digest(self.key)
+
+        class RacingTokens:
+            DoesNotExist = Token.DoesNotExist
+
+            def select_related(self, *fields):
+                return self
+
+            def get(self, **lookup):
+                token = Token.objects.select_related('user').get(**lookup)
+                cache.set(
+                    TokenCache.version_key.format(digest), new_version()
+                )
+                return token
+
+        RacingTokens.objects = RacingTokens()
+        with mock.patch.object(
+            CachedTokenAuthentication, 'get_model', return_value=RacingTokens
+        ):
+            self.assertEqual(self.me().status_code, 200)
+        expires, token, version = token_cache._data[self.key]
+        self.assertNotEqual(version, token_cache.version(digest))
+
+    def test_shared_cache_keeps_only_auth_fields(self):
+        with mock.patch.object(token_cache, 'alias', 'default'):
+            self.assertEqual(self.me().status_code, 200)
+            digest = token_cache.digest(self.key)
+            user_id, is_active, token_digest, version = cache.get(
+                TokenCache.token_key.format(digest)
+            )
+            self.assertEqual(
+                (user_id, is_active, token_digest),
+                (self.user.pk, True, digest)
+            )
+            token_cache._data.clear()
+            response = self.me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['username'], 'cook')
+        self.assertEqual(token_cache.shared_hits, 1)
+
+
+class ConditionalAcrossWorkersTest(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.reader, self.writer = worker_caches()
+        self.reader.clear()
+        self.client = APIClient()
+
+    def get_tags(self, **headers):
+        with mock.patch('api.versions.cache', self.reader):
+            return self.client.get('/api/tags/', **headers)
+
+    def test_write_on_other_worker_changes_etag(self):
+        response = self.get_tags()
+        etag = response['ETag']
+        self.assertEqual(
+            self.get_tags(HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        with mock.patch('api.versions.cache', self.writer):
+            with self.captureOnCommitCallbacks(execute=True):
+                Tag.objects.create(
+                    name='Ужин', color='#49B64E', slug='dinner'
+                )
+        response = self.get_tags(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            [tag['slug'] for tag in response.json()], ['dinner']
+        )
+
+
+class TagFilterAcrossWorkersTest(CacheResetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Текст', cooking_time=10
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.reader, self.writer = worker_caches()
+        self.reader.clear()
+        self.client = APIClient()
+
+    def filter_by(self, slug):
+        with mock.patch('api.versions.cache', self.reader):
+            return self.client.get('/api/recipes/', {'tags': slug})
+
+    def test_tag_created_on_other_worker_is_known(self):
+        self.assertEqual(self.filter_by('dinner').status_code, 400)
+        with mock.patch('api.versions.cache', self.writer):
+            with self.captureOnCommitCallbacks(execute=True):
+                tag = Tag.objects.create(
+                    name='Ужин', color='#49B64E', slug='dinner'
+                )
+                self.recipe.tags.add(tag)
+        response = self.filter_by('dinner')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [self.recipe.pk]
+        )
+
+
+class DownloadShoppingListTest(CacheResetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Текст', cooking_time=10
+        )
+        IngredientRecipe.objects.create(
+            recipe=recipe,
+            ingredient=Ingredient.objects.create(
+                name='Соль', measurement_unit='г'
+            ),
+            amount=5
+        )
+        cls.recipe = recipe
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.post(f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+
+    def download(self, file_format):
+        return self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': file_format}
+        )
+
+    def test_text_is_streamed(self):
+        response = self.download('txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            'Список покупок: \nСоль (г) — 5'
+        )
+
+    def test_pdf_is_sent_whole(self):
+        response = self.download('pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content)
+        )
+
+    def test_errors_are_json(self):
+        self.client.delete(f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+        for file_format in ('txt', 'csv', 'pdf'):
+            with self.subTest(file_format=file_format):
+                response = self.download(file_format)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response['Content-Type'], 'application/json'
+                )
+                self.assertEqual(
+                    json.loads(response.content),
+                    {'detail': 'Список покупок пуст'}
+                )
+        self.client.force_authenticate(None)
+        response = self.download('csv')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', json.loads(response.content))
+
+    @override_settings(SHOPPING_LIST_FONT='/nonexistent/font.ttf')
+    def test_missing_font_fails_clearly(self):
+        self.assertEqual(
+            [warning.id for warning in checks.check_shopping_list_font(None)],
+            ['api.W002']
+        )
+        with mock.patch.object(
+            PDFShoppingListRenderer, 'font_name', 'MissingFont'
+        ):
+            with self.assertRaisesMessage(
+                ImproperlyConfigured, '/nonexistent/font.ttf'
+            ):
+                self.download('pdf')
+
+
+class PantryRebuildTest(CacheResetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = PantryIndex()
+        self.index.build()
+
+    def search_after_write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.index.invalidate()
+        with mock.patch('api.pantry_index.Thread') as thread:
+            self.assertIsNotNone(self.index.search([1]))
+        return thread.called
+
+    @override_settings(PANTRY_REBUILD_INTERVAL=60)
+    def test_rebuilds_are_debounced(self):
+        self.assertTrue(self.search_after_write())
+        self.index._building = False
+        self.assertFalse(self.search_after_write())
+
+    @override_settings(PANTRY_REBUILD_INTERVAL=0)
+    def test_rebuilds_after_interval(self):
+        self.assertTrue(self.search_after_write())
+        self.index._building = False
+        self.assertTrue(self.search_after_write())
+
+
+SQLITE_SCAN = re.compile(
+    r'^(?:\d+ \d+ \d+ )?SCAN (?:TABLE )?(\w+)(?: AS \w+)?$'
+)
+SQLITE_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+INDEXED_FILTERS = {'ids', 'author', 'search'}
+
+
+class RecipeListPlansTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Суп', text='Текст', cooking_time=10
+        )
+        recipe.tags.add(tag)
+        cls.params = {
+            'ids': str(recipe.pk),
+            'author': cls.user.pk,
+            'tags': ['breakfast'],
+            'is_favorited': 1,
+            'is_in_shopping_cart': 1,
+            'search': 'суп',
+        }
+
+    def page_queryset(self, params):
+        request = Request(APIRequestFactory().get('/api/recipes/', params))
+        request.user = self.user
+        view = RecipeViewSet(
+            request=request, action='list', format_kwarg=None, kwargs={}
+        )
+        queryset = view.filter_queryset(view.get_queryset())
+        page_size = view.paginator.get_page_size(request)
+        return view._user_fields(queryset)[:page_size]
+
+    @staticmethod
+    def postgresql_scans(queryset, names):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        nodes = [json.loads(queryset.explain(format='json'))[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan':
+                yield node['Relation Name']
+            nodes.extend(node.get('Plans', ()))
+
+    @staticmethod
+    def sqlite_scans(queryset, names):
+        ordered = not INDEXED_FILTERS & set(names)
+        plan = [line.strip() for line in queryset.explain().splitlines()]
+        for line in plan:
+            match = SQLITE_SCAN.match(line)
+            if match is None:
+                continue
+            table = match.group(1)
+            if ordered and table == Recipe._meta.db_table and not any(
+                line.endswith(SQLITE_SORT) for line in plan
+            ):
+                continue
+            yield table
+
+    def test_filters_do_not_scan_tables(self):
+        if connection.vendor == 'postgresql':
+            scans = self.postgresql_scans
+        else:
+            scans = self.sqlite_scans
+        for size in range(len(self.params) + 1):
+            for names in combinations(self.params, size):
+                with self.subTest(filters=names):
+                    self.assertEqual(set(scans(self.page_queryset(
+                        {name: self.params[name] for name in names}
+                    ), names)), set())
+
+
+@override_settings(INGREDIENT_INDEX=False)
+class FastReadPathTest(CacheResetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        author = User.objects.create_user(
+            username='chef', email='chef@example.com', password='password',
+            first_name='Шеф', last_name='Повар'
+        )
+        Follow.objects.create(user=cls.user, author=author)
+        tags = [
+            Tag.objects.create(
+                name='Завтрак', color='#E26C2D', slug='breakfast'
+            ),
+            Tag.objects.create(name='Ужин', color='#49B64E', slug='dinner'),
+        ]
+        ingredients = [
+            Ingredient.objects.create(name='Соль', measurement_unit='г'),
+            Ingredient.objects.create(name='Сахар', measurement_unit='г'),
+            Ingredient.objects.create(name='Молоко', measurement_unit='мл'),
+        ]
+        for number in range(5):
+            recipe = Recipe.objects.create(
+                author=author if number % 2 else cls.user,
+                name=f'Рецепт «{number}»',
+                text='Текст\nс "кавычками"',
+                cooking_time=number + 1
+            )
+            recipe.tags.set(tags[:number % 2 + 1])
+            for position, ingredient in enumerate(ingredients[number % 2:]):
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=position + 1
+                )
+        Favourite.objects.create(user=cls.user, recipe=recipe)
+        ShoppingList.objects.create(user=cls.user, recipe=recipe)
+        cls.recipe, cls.tag, cls.ingredient = recipe, tags[0], ingredients[0]
+
+    def render(self, path, params, user, fast):
+        self.reset_caches()
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        with override_settings(FAST_READ_PATH=fast):
+            response = client.get(path, params)
+        return response.status_code, response.content
+
+    def test_fast_path_matches_serializers(self):
+        endpoints = [
+            ('/api/recipes/', {'limit': 20}),
+            (f'/api/recipes/{self.recipe.pk}/', {}),
+            ('/api/tags/', {}),
+            (f'/api/tags/{self.tag.pk}/', {}),
+            ('/api/ingredients/', {}),
+            ('/api/ingredients/', {'name': 'Са'}),
+            (f'/api/ingredients/{self.ingredient.pk}/', {}),
+        ]
+        for path, params in endpoints:
+            for user in (None, self.user):
+                with self.subTest(path=path, params=params, user=user):
+                    slow = self.render(path, params, user, False)
+                    self.assertEqual(slow[0], 200)
+                    self.assertEqual(
+                        self.render(path, params, user, True), slow
+                    )
+        for params in ({}, {'recipes_limit': 1}):
+            with self.subTest(path='subscriptions', params=params):
+                path = '/api/users/subscriptions/'
+                slow = self.render(path, params, self.user, False)
+                self.assertEqual(slow[0], 200)
+                self.assertEqual(
+                    self.render(path, params, self.user, True), slow
+                )
+
+    def test_orjson_matches_json_renderer(self):
+        data = self.client.get('/api/recipes/').json()
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+
+class AsyncTogglesTest(CacheResetMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        self.author = User.objects.create_user(
+            username='chef', email='chef@example.com', password='password'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Текст', cooking_time=10
+        )
+        self.key = Token.objects.create(user=self.user).key
+
+    def responses(self, view, path, pk):
+        factory = RequestFactory()
+        auth = {'HTTP_AUTHORIZATION': f'Token {self.key}'}
+        requests = [
+            factory.post(path, **auth),
+            factory.post(path, **auth),
+            factory.delete(path, **auth),
+            factory.delete(path, **auth),
+            factory.post(path),
+            factory.post(path, HTTP_AUTHORIZATION='Token wrong'),
+            factory.get(path, **auth),
+        ]
+        results = []
+        for request in requests:
+            response = view(request, pk=pk)
+            response.render()
+            results.append((
+                response.status_code,
+                response.content,
+                response.get('Content-Type'),
+                response.get('WWW-Authenticate'),
+                response.get('Allow'),
+            ))
+        return results
+
+    def assert_same_responses(self, sync_view, async_view, path, pk):
+        expected = self.responses(sync_view, path, pk)
+        self.assertEqual(
+            [status for status, *_ in expected],
+            [201, 400, 204, 404, 401, 401, 405]
+        )
+        self.assertEqual(
+            self.responses(async_to_sync(async_view), path, pk), expected
+        )
+
+    def test_favourite_matches_sync_view(self):
+        self.assert_same_responses(
+            FavouriteView.as_view(), async_views.favourite,
+            f'/api/recipes/{self.recipe.pk}/favorite/', self.recipe.pk
+        )
+
+    def test_subscription_matches_sync_view(self):
+        self.assert_same_responses(
+            Subscribe.as_view(), async_views.subscription,
+            f'/api/users/{self.author.pk}/subscribe/', self.author.pk
+        )
+
+
+@override_settings(PANTRY_INDEX=False)
+class RecipeImageKindTest(CacheResetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        author = User.objects.create_user(
+            username='chef', email='chef@example.com', password='password'
+        )
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        recipe, other = (
+            Recipe.objects.create(
+                author=author, name=name, text='Текст', cooking_time=10
+            )
+            for name in ('Рецепт', 'Другой рецепт')
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image='recipes/images/soup.png'
+        )
+        for kind in (RecipeImage.CARD, RecipeImage.DETAIL):
+            RecipeImage.objects.create(
+                recipe=recipe,
+                kind=kind,
+                format=RecipeImage.WEBP,
+                source='recipes/images/soup.png',
+                image=f'recipes/variants/soup-{kind}.webp',
+                width=1,
+                height=1
+            )
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1
+        )
+        SimilarRecipe.objects.create(
+            recipe=other, similar=recipe, score=1, computed_at=timezone.now()
+        )
+        Follow.objects.create(user=cls.user, author=author)
+        cls.recipe, cls.other, cls.ingredient = recipe, other, ingredient
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def image(self, path, params=None):
+        response = self.client.get(path, params or {})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        if isinstance(data, dict) and 'results' in data:
+            data = data['results']
+        if isinstance(data, list):
+            data = next(
+                recipe for recipe in data if recipe['id'] == self.recipe.pk
+            )
+        return data['image']
+
+    def test_card_lists_use_card_images(self):
+        for path, params in (
+            ('/api/recipes/', {}),
+            ('/api/recipes/feed/', {}),
+            (f'/api/recipes/{self.other.pk}/similar/', {}),
+            ('/api/recipes/pantry/', {'ingredients': self.ingredient.pk}),
+        ):
+            with self.subTest(path=path):
+                self.assertTrue(
+                    self.image(path, params).endswith('soup-card.webp')
+                )
+
+    def test_recipe_page_uses_detail_image(self):
+        self.assertTrue(self.image(
+            f'/api/recipes/{self.recipe.pk}/'
+        ).endswith('soup-detail.webp'))
@@ -1,13 +1,19 @@
+from api import async_views
 from api.views import (
     DownloadShoppingList,
     Favourite,
+    FavouriteBatch,
+    ImageUploadChunks,
+    ImageUploads,
     IngredientViewSet,
     RecipeViewSet,
     ShoppingList,
+    ShoppingListBatch,
     Subscribe,
     Subscriptions,
     TagViewSet,
 )
+from django.conf import settings
 from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
@@ -18,17 +24,37 @@ router.register('ingredients', IngredientViewSet, basename='ingredient')
 router.register('tags', TagViewSet, basename='tag')
 
 
-urlpatterns = [
-    path('recipes/download_shopping_cart/',
-         DownloadShoppingList.as_view()),
-    path('users/subscriptions/',
-         Subscriptions.as_view()),
+toggles = [
     re_path(r'^users/(?P<pk>\d+)/subscribe/$',
             Subscribe.as_view()),
     re_path(r'^recipes/(?P<pk>\d+)/favorite/$',
             Favourite.as_view()),
     re_path(r'^recipes/(?P<pk>\d+)/shopping_cart/$',
             ShoppingList.as_view()),
+]
+if settings.ASYNC_TOGGLES:
+    toggles = [
+        re_path(r'^users/(?P<pk>\d+)/subscribe/$',
+                async_views.subscription),
+        re_path(r'^recipes/(?P<pk>\d+)/favorite/$',
+                async_views.favourite),
+        re_path(r'^recipes/(?P<pk>\d+)/shopping_cart/$',
+                async_views.shopping_cart),
+    ]
+
+
+urlpatterns = [
+    path('recipes/download_shopping_cart/',
+         DownloadShoppingList.as_view()),
+    path('users/subscriptions/',
+         Subscriptions.as_view()),
+    path('recipes/favorite/',
+         FavouriteBatch.as_view()),
+    path('recipes/shopping_cart/',
+         ShoppingListBatch.as_view()),
+    *toggles,
+    path('uploads/', ImageUploads.as_view()),
+    path('uploads/<uuid:pk>/', ImageUploadChunks.as_view()),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
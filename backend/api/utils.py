@@ -1,30 +1,64 @@
+from api.serializers import RecipeIdsSerializer
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from recipes.models import Recipe
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
 
+def add_recipe(request, pk, model, serializer_class):
+    added = model.objects.add(request.user.pk, (int(pk),))
+    recipe = get_object_or_404(
+        Recipe.objects.prefetch_related('image_variants'), pk=pk
+    )
+    if not added:
+        raise serializers.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: [
+                serializer_class.duplicate_message
+            ]
+        })
+    return serializer_class(recipe, context={'request': request}).data
+
+
+def delete_recipe(request, pk, model):
+    if not model.objects.remove(request.user.pk, (int(pk),)):
+        raise Http404
+
+
 class AddAndDeleteAPIview(APIView):
     def post(self, request, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        return Response(
+            add_recipe(request, pk, self.model, self.serializer_class),
+            status=status.HTTP_201_CREATED
+        )
+
+    def delete(self, request, pk):
+        delete_recipe(request, pk, self.model)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class BatchAddAndDeleteAPIview(APIView):
+    def post(self, request):
+        added = self.model.objects.add(
+            request.user.pk, self._recipe_ids(request)
+        )
         serializer = self.serializer_class(
-            recipe,
-            data=request.data,
+            Recipe.objects.filter(pk__in=added).prefetch_related(
+                'image_variants'
+            ),
+            many=True,
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        self.model.objects.create(
-            user=request.user,
-            recipe=recipe
-        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def delete(self, request, pk):
-        queryset = get_object_or_404(
-            self.model,
-            user=request.user,
-            recipe=get_object_or_404(Recipe, pk=pk)
-        )
-        queryset.delete()
+    def delete(self, request):
+        self.model.objects.remove(request.user.pk, self._recipe_ids(request))
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @staticmethod
+    def _recipe_ids(request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['recipes']
@@ -0,0 +1,37 @@
+import time
+from uuid import uuid4
+
+from django.core.cache import cache, caches
+from django.db import transaction
+
+TAGS_VERSION = 'catalogue:tags'
+INGREDIENTS_VERSION = 'catalogue:ingredients'
+PANTRY_VERSION = 'catalogue:pantry'
+
+
+def new_version():
+    return time.time(), uuid4().hex
+
+
+def _store(using):
+    return caches[using] if using else cache
+
+
+def get_versions(keys, using=None):
+    store = _store(using)
+    versions = store.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        store.set_many(missing, timeout=None)
+        versions.update(missing)
+    return versions
+
+
+def get_version(key, using=None):
+    return get_versions([key], using)[key]
+
+
+def touch(*keys, using=None):
+    transaction.on_commit(lambda: _store(using).set_many(
+        {key: new_version() for key in keys}, timeout=None
+    ))
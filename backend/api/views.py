@@ -1,37 +1,100 @@
+from datetime import timedelta
+from itertools import chain
+
+from api.cache import (
+    RECIPE_USER_FIELDS,
+    overlay_user_fields,
+    recipe_cache,
+)
+from api.conditional import make_etag, not_modified, set_validators
 from api.filters import IngredientFilter, RecipeFilter
-from api.mixins import OnlyReadViewSet
-from api.pagination import CustomPagination
+from api.ingredient_index import ingredient_index
+from api.mixins import OnlyReadViewSet, VersionedMixin
+from api.models import ImageUpload
+from api.pagination import (
+    CustomPagination,
+    FeedPagination,
+    PantryPagination,
+    RecipePagination,
+)
+from api.pantry_index import pantry_index
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from api.renderers import (
+    CSVShoppingListRenderer,
+    PDFShoppingListRenderer,
+    TextShoppingListRenderer,
+)
+from api.representations import (
+    INGREDIENT_FIELDS,
+    SUBSCRIPTION_FIELDS,
+    TAG_FIELDS,
+    recipe_bodies,
+    subscription_bodies,
+)
 from api.serializers import (
     FavouriteSerializer,
     FollowSerializer,
+    ImageUploadSerializer,
     IngredientSerializer,
+    PantrySerializer,
     ReadOnlyRecipeSerializer,
     RecipeWriteSerializer,
     ShoppingListSerializer,
     TagSerializer,
 )
-from api.utils import AddAndDeleteAPIview
+from api.utils import AddAndDeleteAPIview, BatchAddAndDeleteAPIview
+from api.versions import INGREDIENTS_VERSION, TAGS_VERSION
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Q,
+    Value,
+    prefetch_related_objects,
+)
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from recipes.models import (
     Favourite,
     Ingredient,
     IngredientRecipe,
     Recipe,
+    RecipeImage,
+    ShoppingCartIngredient,
     ShoppingList,
+    SimilarRecipe,
     Tag,
+    TimelineEntry,
 )
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from users.models import Follow, User
 
 
+class FavouriteBatch(BatchAddAndDeleteAPIview):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = FavouriteSerializer
+    model = Favourite
+
+
+class ShoppingListBatch(BatchAddAndDeleteAPIview):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = ShoppingListSerializer
+    model = ShoppingList
+
+
 class Favourite(AddAndDeleteAPIview):
     permission_classes = (IsAuthenticated,)
     serializer_class = FavouriteSerializer
@@ -59,33 +122,341 @@ class ShoppingList(AddAndDeleteAPIview):
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     http_method_names = ('get', 'post', 'patch', 'delete',)
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     permissions_classes = (IsAuthorOrReadOnly,)
+    card_actions = ('list', 'feed', 'similar', 'pantry')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredientrecipes',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            ),
+            'image_variants',
+        )
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                user.favourites.filter(recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(
+                user.shopping_lists.filter(recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(
+                user.follower.filter(author=OuterRef('author'))),
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(self._user_fields(queryset))
+        return self._conditional_response(page, self.get_paginated_response)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        paginator = FeedPagination()
+        ids = paginator.paginate_recipe_ids(
+            TimelineEntry.objects.recipe_ids, request
+        )
+        rows = list(self._user_fields(self.get_queryset().filter(pk__in=ids)))
+        return self._conditional_response(
+            rows, paginator.get_paginated_response
+        )
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        ids = list(SimilarRecipe.objects.filter(recipe=recipe).order_by(
+            '-score'
+        ).values_list('similar_id', flat=True)[
+            :settings.SIMILAR_RECIPES_COUNT
+        ])
+        rows = {
+            row['id']: row for row in
+            self._user_fields(self.get_queryset().filter(pk__in=ids))
+        }
+        return self._conditional_response(
+            [rows[pk] for pk in ids if pk in rows], Response
+        )
+
+    @action(detail=False)
+    def pantry(self, request):
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        matches = None
+        if settings.PANTRY_INDEX:
+            matches = pantry_index.search(
+                serializer.validated_data['ingredients'],
+                serializer.validated_data['tags'],
+                serializer.validated_data['cooking_time']
+            )
+        if matches is None:
+            matches = self._pantry_matches(**serializer.validated_data)
+        paginator = PantryPagination()
+        page = {
+            match['id']: match
+            for match in paginator.paginate_queryset(matches, request, self)
+        }
+        rows = {
+            row['id']: row for row in
+            self._user_fields(self.get_queryset().filter(pk__in=page))
+        }
+        return self._conditional_response(
+            [rows[pk] for pk in page if pk in rows],
+            lambda data: paginator.get_paginated_response([
+                dict(
+                    recipe,
+                    matched_ingredients=page[recipe['id']]['matched'],
+                    missing_ingredients=page[recipe['id']]['missing']
+                )
+                for recipe in data
+            ])
+        )
+
+    @staticmethod
+    def _pantry_matches(ingredients, tags, cooking_time):
+        queryset = Recipe.objects.annotate(
+            matched=Count(
+                'ingredientrecipes',
+                filter=Q(ingredientrecipes__ingredient_id__in=ingredients)
+            ),
+            missing=Count('ingredientrecipes') - F('matched'),
+        ).filter(matched__gt=0)
+        if tags:
+            queryset = queryset.filter(Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag_id__in=tags
+                )
+            ))
+        if cooking_time is not None:
+            queryset = queryset.filter(cooking_time__lte=cooking_time)
+        return queryset.order_by('missing', '-matched', '-id').values(
+            'id', 'matched', 'missing'
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        row = get_object_or_404(
+            self._user_fields(self.get_queryset()), pk=kwargs['pk']
+        )
+        return self._conditional_response(
+            [row], lambda data: Response(data[0])
+        )
+
+    @staticmethod
+    def _user_fields(queryset):
+        return queryset.prefetch_related(None).values(
+            'id', 'author_id', 'updated_at', *RECIPE_USER_FIELDS
+        )
+
+    def _conditional_response(self, rows, respond):
+        versions, shared = recipe_cache.versions(rows, self.request.user.pk)
+        etag = make_etag(
+            self.request.build_absolute_uri(),
+            self.request.accepted_renderer.format,
+            shared,
+            [(row, versions[row['id']]) for row in rows]
+        )
+        last_modified = max(
+            [timestamp for timestamp, _ in shared]
+            + [
+                timestamp for version in versions.values()
+                for timestamp, _ in version
+            ]
+            + [row['updated_at'].timestamp() for row in rows]
+        )
+        response = not_modified(self.request, etag, last_modified)
+        if response is None:
+            response = respond(self._cached_representation(rows, versions))
+        return set_validators(response, etag, last_modified)
+
+    def initial(self, request, *args, **kwargs):
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        super().initial(request, *args, **kwargs)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        image_format = self.request.query_params.get('image_format')
+        if image_format in dict(RecipeImage.FORMATS):
+            context['image_format'] = image_format
+        if self.action in self.card_actions:
+            context['image_kind'] = RecipeImage.CARD
+        return context
+
+    def _cached_representation(self, rows, versions):
+        context = self.get_serializer_context()
+        prefix = (
+            self.request.build_absolute_uri('/'),
+            context.get('image_kind'),
+            context.get('image_format'),
+        )
+        bodies = recipe_cache.get_many(versions, prefix)
+        missing = [row['id'] for row in rows if row['id'] not in bodies]
+        if missing and settings.FAST_READ_PATH:
+            fresh = recipe_bodies(
+                missing,
+                self.request,
+                context.get('image_kind'),
+                context.get('image_format')
+            )
+            recipe_cache.set_many(fresh, versions, prefix)
+            bodies.update(fresh)
+        elif missing:
+            serializer = ReadOnlyRecipeSerializer(
+                self.get_queryset().filter(pk__in=missing),
+                many=True,
+                context=context
+            )
+            fresh = {recipe['id']: recipe for recipe in serializer.data}
+            recipe_cache.set_many(fresh, versions, prefix)
+            bodies.update(fresh)
+        return [overlay_user_fields(bodies[row['id']], row) for row in rows]
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,)
+    )
+    def bulk(self, request):
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.BATCH_RECIPES_LIMIT
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def get_serializer_class(self):
         if self.action in ('retrieve', 'list'):
             return ReadOnlyRecipeSerializer
         return RecipeWriteSerializer
 
 
-class IngredientViewSet(OnlyReadViewSet):
+class IngredientViewSet(VersionedMixin, OnlyReadViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (IngredientFilter,)
     search_fields = ('^name',)
+    version_key = INGREDIENTS_VERSION
+    values_fields = INGREDIENT_FIELDS
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self._search, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def _search(self, request, *args, **kwargs):
+        if settings.INGREDIENT_INDEX:
+            ingredients = ingredient_index.search(
+                IngredientFilter().get_search_terms(request)
+            )
+            if ingredients is not None:
+                return Response(ingredients)
+        return super().list(request, *args, **kwargs)
 
 
-class TagViewSet(OnlyReadViewSet):
+class TagViewSet(VersionedMixin, OnlyReadViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
+    version_key = TAGS_VERSION
+    values_fields = TAG_FIELDS
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ImageUploads(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        expired = request.user.image_uploads.filter(
+            created__lt=timezone.now() - timedelta(
+                hours=settings.IMAGE_UPLOAD_EXPIRE_HOURS
+            )
+        )
+        for upload in expired:
+            upload.discard()
+        upload = ImageUpload.objects.create(user=request.user)
+        upload.path.parent.mkdir(parents=True, exist_ok=True)
+        upload.path.touch()
+        return Response(
+            ImageUploadSerializer(upload).data,
+            status=status.HTTP_201_CREATED
+        )
+
+
+class ImageUploadChunks(APIView):
+    permission_classes = (IsAuthenticated,)
+    chunk_size = 64 * 1024
+
+    def get(self, request, pk):
+        upload = get_object_or_404(ImageUpload, pk=pk, user=request.user)
+        return Response(ImageUploadSerializer(upload).data)
+
+    @transaction.atomic
+    def patch(self, request, pk):
+        upload = get_object_or_404(
+            ImageUpload.objects.select_for_update(),
+            pk=pk,
+            user=request.user
+        )
+        if request.headers.get('Upload-Offset') != str(upload.offset):
+            return Response(
+                ImageUploadSerializer(upload).data,
+                status=status.HTTP_409_CONFLICT
+            )
+        offset = upload.offset
+        stream = request.stream
+        with open(upload.path, 'r+b') as file:
+            file.seek(offset)
+            while stream is not None:
+                chunk = stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                if offset > settings.IMAGE_UPLOAD_MAX_SIZE:
+                    file.truncate(upload.offset)
+                    return Response(
+                        {'detail': 'Файл слишком большой'},
+                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                    )
+                file.write(chunk)
+            file.truncate(offset)
+        upload.offset = offset
+        upload.save(update_fields=('offset',))
+        return Response(ImageUploadSerializer(upload).data)
+
+    def delete(self, request, pk):
+        upload = get_object_or_404(ImageUpload, pk=pk, user=request.user)
+        upload.discard()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class Subscriptions(APIView, CustomPagination):
@@ -93,8 +464,25 @@ class Subscriptions(APIView, CustomPagination):
 
     @action(detail=False)
     def get(self, request):
-        subscriptions = User.objects.filter(following__user=request.user)
+        subscriptions = User.objects.filter(
+            following__user=request.user
+        ).order_by('-id')
+        recipes_limit = request.query_params.get('recipes_limit')
+        if settings.FAST_READ_PATH:
+            return self.get_paginated_response(subscription_bodies(
+                self.paginate_queryset(
+                    subscriptions.values(*SUBSCRIPTION_FIELDS), request
+                ),
+                request,
+                int(recipes_limit) if recipes_limit else None
+            ))
         res = self.paginate_queryset(subscriptions, request)
+        recipes = Recipe.objects.filter(author__in=res).prefetch_related(
+            'image_variants'
+        ).order_by('-id')
+        if recipes_limit:
+            recipes = recipes.limit_per_author(int(recipes_limit))
+        prefetch_related_objects(res, Prefetch('recipes', queryset=recipes))
         serializer = FollowSerializer(
             res,
             many=True,
@@ -115,7 +503,8 @@ class Subscribe(APIView):
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        Follow.objects.create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.create(user=request.user, author=author)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True)
@@ -130,28 +519,48 @@ class Subscribe(APIView):
 
 
 class DownloadShoppingList(APIView):
-    permission_classes = (IsAuthorOrReadOnly,)
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (
+        TextShoppingListRenderer,
+        CSVShoppingListRenderer,
+        PDFShoppingListRenderer,
+    )
 
     def get(self, request):
-        if not request.user.shopping_lists.exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shopping_lists__user=request.user
+        ingredients = ShoppingCartIngredient.objects.filter(
+            user=request.user
         ).order_by('ingredient__name').values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        shopping_list = 'Список покупок: '
-        shopping_list += '\n'.join(
-            [
-                f'\n{ingredient["ingredient__name"]} '
-                f'({ingredient["ingredient__measurement_unit"]})'
-                f' — {ingredient["amount"]}'
-                for ingredient in ingredients
-            ]
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        ).iterator()
+        first = next(ingredients, None)
+        if first is None:
+            return Response(
+                {'detail': 'Список покупок пуст'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        content = renderer.stream(chain((first,), ingredients))
+        if renderer.streaming:
+            response = StreamingHttpResponse(
+                content, content_type=content_type
+            )
+        else:
+            response = HttpResponse(
+                b''.join(content), content_type=content_type
+            )
+        file = f'shopping_list.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename="{file}"'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
         )
-        file = 'shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename="{file}.txt"'
+        if isinstance(response, Response):
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = JSONRenderer.media_type
         return response
@@ -5,6 +5,52 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 RECIPES_LENGTH = 200
 
+RECIPE_CACHE_SIZE = int(os.getenv('RECIPE_CACHE_SIZE', 1000))
+
+ADMIN_TEXT_LENGTH = 100
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(
+    os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000)
+)
+
+BATCH_RECIPES_LIMIT = int(os.getenv('BATCH_RECIPES_LIMIT', 100))
+
+ASYNC_TOGGLES = os.getenv('ASYNC_TOGGLES', 'False') == 'True'
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS')
+
+INGREDIENT_INDEX = os.getenv('INGREDIENT_INDEX', 'True') == 'True'
+
+FAST_READ_PATH = os.getenv('FAST_READ_PATH', 'False') == 'True'
+ORJSON_RENDERER = os.getenv('ORJSON_RENDERER', 'False') == 'True'
+
+RECIPE_IMAGE_SIZES = {
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+RECIPE_IMAGE_FORMAT = 'webp'
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+FEED_FAN_OUT_LIMIT = int(os.getenv('FEED_FAN_OUT_LIMIT', 10000))
+FEED_FAN_OUT_BATCH_SIZE = 1000
+FEED_FAN_OUT_WORKERS = int(os.getenv('FEED_FAN_OUT_WORKERS', 2))
+FEED_BACKFILL_SIZE = 100
+
+SIMILAR_RECIPES_COUNT = 10
+
+PANTRY_INDEX = os.getenv('PANTRY_INDEX', 'True') == 'True'
+PANTRY_INGREDIENTS_LIMIT = 100
+# Индекс подбора по продуктам перестраивается не чаще раза в столько секунд:
+# изменения рецептов видны в поиске не позже чем через этот интервал плюс
+# время одной перестройки, до тех пор отдаётся прежний снимок
+PANTRY_REBUILD_INTERVAL = int(os.getenv('PANTRY_REBUILD_INTERVAL', 60))
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 SECRET_KEY = os.getenv('SECRET_KEY', 'qwerty')
 # Debug
 DEBUG = False
@@ -74,6 +120,21 @@ DATABASES = {
 }
 
 
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', LOCAL_CACHE_BACKEND)
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+if CACHE_BACKEND == LOCAL_CACHE_BACKEND:
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -116,6 +177,10 @@ STATIC_ROOT = BASE_DIR / 'static_backend'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+IMAGE_UPLOAD_ROOT = BASE_DIR / 'uploads'
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_UPLOAD_EXPIRE_HOURS = 24
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -128,7 +193,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer' if ORJSON_RENDERER
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
 
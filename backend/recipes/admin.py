@@ -1,12 +1,82 @@
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+from django.utils.text import Truncator
 from recipes.models import (
     Favourite,
     Ingredient,
     IngredientRecipe,
     Recipe,
+    ShoppingCartIngredient,
     ShoppingList,
     Tag,
 )
+from users.models import User
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+        return super().count
+
+
+class AuthorFilter(admin.SimpleListFilter):
+    title = 'автор'
+    parameter_name = 'author'
+    template = 'admin/recipes/autocomplete_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.admin_site = model_admin.admin_site
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(author_id=self.value())
+        return queryset
+
+    def widget(self):
+        return forms.ModelChoiceField(
+            queryset=User.objects.all(),
+            widget=AutocompleteSelect(
+                Recipe._meta.get_field('author'), self.admin_site
+            )
+        ).widget
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name, 'p']
+            ),
+            'display': 'Все',
+            'widget': self.widget().render(
+                self.parameter_name, self.value(),
+                attrs={'id': 'changelist-filter-author'}
+            ),
+        }
 
 
 class RecipeAdmin(admin.ModelAdmin):
@@ -17,16 +87,34 @@ class RecipeAdmin(admin.ModelAdmin):
         'get_ingredients',
         'name',
         'image',
-        'text',
+        'short_text',
         'cooking_time',
         'in_favorited',
     )
 
-    list_filter = ('author', 'name', 'tags',)
+    list_filter = (AuthorFilter, 'tags',)
+    search_fields = ('^name',)
+    autocomplete_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(
+            Recipe._meta.get_field('author'), self.admin_site
+        ).media
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('name')),
+            Prefetch('ingredients', queryset=Ingredient.objects.only('name')),
+        )
 
-    @admin.display(description='в избранном')
+    @admin.display(description='в избранном', ordering='favourites_count')
     def in_favorited(self, obj):
-        return obj.favourites.count()
+        return obj.favourites_count
 
     @admin.display(description='тэги')
     def get_tags(self, obj):
@@ -36,6 +124,10 @@ class RecipeAdmin(admin.ModelAdmin):
     def get_ingredients(self, obj):
         return [i.name for i in obj.ingredients.all()]
 
+    @admin.display(description='текст')
+    def short_text(self, obj):
+        return Truncator(obj.text).chars(settings.ADMIN_TEXT_LENGTH)
+
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = (
@@ -43,12 +135,42 @@ class IngredientAdmin(admin.ModelAdmin):
         'name',
         'measurement_unit'
     )
-    list_filter = ('name',)
+    search_fields = ('^name',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class IngredientRecipeAdmin(admin.ModelAdmin):
+    @staticmethod
+    def _change_carts(ingredient_recipe, sign):
+        ShoppingCartIngredient.objects.change_recipe(
+            ingredient_recipe.recipe_id,
+            {ingredient_recipe.ingredient_id: ingredient_recipe.amount},
+            sign
+        )
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        if change:
+            self._change_carts(IngredientRecipe.objects.get(pk=obj.pk), -1)
+        super().save_model(request, obj, form, change)
+        self._change_carts(obj, 1)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        self._change_carts(obj, -1)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for ingredient_recipe in queryset:
+            self._change_carts(ingredient_recipe, -1)
+        super().delete_queryset(request, queryset)
 
 
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Tag)
 admin.site.register(ShoppingList)
-admin.site.register(IngredientRecipe)
+admin.site.register(IngredientRecipe, IngredientRecipeAdmin)
 admin.site.register(Favourite)
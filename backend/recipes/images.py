@@ -0,0 +1,94 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+from recipes.models import Recipe, RecipeImage
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=settings.RECIPE_IMAGE_WORKERS)
+
+
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, image_format):
+    if image_format == RecipeImage.JPEG:
+        image = _flatten(image)
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(
+        buffer, image_format.upper(), quality=settings.RECIPE_IMAGE_QUALITY
+    )
+    return buffer.getvalue()
+
+
+def generate_variants(recipe_id, force=False):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return False
+    variants = {
+        (variant.kind, variant.format): variant
+        for variant in recipe.image_variants.all()
+    }
+    expected = [
+        (kind, image_format)
+        for kind in settings.RECIPE_IMAGE_SIZES
+        for image_format, _ in RecipeImage.FORMATS
+    ]
+    if not force and all(
+        key in variants and variants[key].source == recipe.image.name
+        for key in expected
+    ):
+        return False
+
+    with recipe.image.open('rb') as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    stem = Path(recipe.image.name).stem
+    for kind, size in settings.RECIPE_IMAGE_SIZES.items():
+        thumbnail = original.copy()
+        thumbnail.thumbnail(size, Image.LANCZOS)
+        for image_format, _ in RecipeImage.FORMATS:
+            variant = variants.get((kind, image_format)) or RecipeImage(
+                recipe=recipe, kind=kind, format=image_format
+            )
+            old_name = variant.image.name if variant.pk else None
+            variant.source = recipe.image.name
+            variant.image.save(
+                f'{stem}_{kind}.{image_format}',
+                ContentFile(_encode(thumbnail, image_format)),
+                save=False
+            )
+            variant.save()
+            if old_name and old_name != variant.image.name:
+                variant.image.storage.delete(old_name)
+    return True
+
+
+def _generate_in_background(recipe_id):
+    try:
+        generate_variants(recipe_id)
+    except Exception:
+        logger.exception('Не удалось подготовить картинки рецепта %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_variants(recipe_id):
+    transaction.on_commit(
+        lambda: executor.submit(_generate_in_background, recipe_id)
+    )
@@ -0,0 +1,113 @@
+import base64
+import time
+from io import BytesIO
+
+from api.views import RecipeViewSet
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIRequestFactory, force_authenticate
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт рецепты во временной транзакции по одному и пачками через '
+        '/api/recipes/bulk/ и сравнивает число рецептов в секунду'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=200,
+            help='Сколько рецептов создать в каждом режиме',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=10,
+            help='Сколько ингредиентов в каждом рецепте',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.BATCH_RECIPES_LIMIT,
+            help='Сколько рецептов отправлять в одном запросе к bulk',
+        )
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Хост для абсолютных ссылок на картинки',
+        )
+
+    def handle(self, *args, **options):
+        tag_ids = list(Tag.objects.values_list('id', flat=True)[:1])
+        ingredient_ids = list(Ingredient.objects.values_list(
+            'id', flat=True
+        )[:options['ingredients']])
+        if not tag_ids or not ingredient_ids:
+            raise CommandError('Нужны хотя бы один тег и один ингредиент')
+        buffer = BytesIO()
+        Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+        recipe = {
+            'tags': tag_ids,
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 1}
+                for ingredient_id in ingredient_ids
+            ],
+            'name': 'Рецепт',
+            'text': 'Текст',
+            'cooking_time': 10,
+            'image': 'data:image/png;base64,'
+                     + base64.b64encode(buffer.getvalue()).decode(),
+        }
+        factory = APIRequestFactory(SERVER_NAME=options['host'])
+        count = options['recipes']
+        batch_size = max(
+            min(options['batch_size'], settings.BATCH_RECIPES_LIMIT), 1
+        )
+        modes = {
+            'по одному': (
+                RecipeViewSet.as_view({'post': 'create'}),
+                '/api/recipes/',
+                [recipe] * count,
+            ),
+            'bulk': (
+                RecipeViewSet.as_view({'post': 'bulk'}),
+                '/api/recipes/bulk/',
+                [
+                    [recipe] * min(batch_size, count - start)
+                    for start in range(0, count, batch_size)
+                ],
+            ),
+        }
+        for label, (view, path, payloads) in modes.items():
+            with transaction.atomic():
+                user, _ = User.objects.get_or_create(
+                    username='benchmark-bulk',
+                    defaults={'email': 'benchmark-bulk@example.com'}
+                )
+                start = time.perf_counter()
+                for payload in payloads:
+                    request = factory.post(path, payload, format='json')
+                    force_authenticate(request, user)
+                    response = view(request)
+                    if response.status_code != 201:
+                        raise CommandError(
+                            f'{label}: {response.status_code} {response.data}'
+                        )
+                elapsed = time.perf_counter() - start
+                images = list(Recipe.objects.filter(author=user).values_list(
+                    'image', flat=True
+                ))
+                transaction.set_rollback(True)
+            for image in images:
+                default_storage.delete(image)
+            self.stdout.write(
+                f'{label}: {count / elapsed:.0f} рецептов/с '
+                f'({len(payloads)} запросов)'
+            )
@@ -0,0 +1,91 @@
+import time
+
+from api.renderers import ORJSONRenderer
+from api.representations import recipe_bodies
+from api.serializers import ReadOnlyRecipeSerializer
+from api.views import RecipeViewSet
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe, RecipeImage
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет время сериализации рецептов сериализаторами DRF и быстрым '
+        'путём чтения на 1000 рецептов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1000,
+            help='Сколько рецептов сериализовать для замера',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Сколько раз повторить замер',
+        )
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Хост для абсолютных ссылок на картинки',
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = list(
+            Recipe.objects.values_list('pk', flat=True)[:options['recipes']]
+        )
+        if not recipe_ids:
+            self.stdout.write('Нет рецептов для замера')
+            return
+        factory = APIRequestFactory(SERVER_NAME=options['host'])
+        request = Request(factory.get('/api/recipes/'))
+        request.user = AnonymousUser()
+        view = RecipeViewSet(
+            request=request, action='list', format_kwarg=None, kwargs={}
+        )
+        context = {'request': request, 'image_kind': RecipeImage.CARD}
+
+        def serialize():
+            return ReadOnlyRecipeSerializer(
+                view.get_queryset().filter(pk__in=recipe_ids),
+                many=True,
+                context=context
+            ).data
+
+        def build():
+            return list(
+                recipe_bodies(recipe_ids, request, RecipeImage.CARD).values()
+            )
+
+        repeat = options['repeat']
+        timings = {}
+        timings['сериализаторы DRF'], _ = self._measure(serialize, repeat)
+        timings['быстрый путь'], data = self._measure(build, repeat)
+        timings['рендер json'], _ = self._measure(
+            lambda: JSONRenderer().render(data), repeat
+        )
+        timings['рендер orjson'], _ = self._measure(
+            lambda: ORJSONRenderer().render(data), repeat
+        )
+        for label, seconds in timings.items():
+            self.stdout.write(
+                f'{label}: {seconds * 1000 * 1000 / len(recipe_ids):.1f} мс '
+                f'на 1000 рецептов'
+            )
+
+    @staticmethod
+    def _measure(func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
@@ -0,0 +1,88 @@
+import time
+
+from api.filters import IngredientFilter
+from api.ingredient_index import ingredient_index
+from api.representations import INGREDIENT_FIELDS
+from api.views import IngredientViewSet
+from django.core.management.base import BaseCommand
+from recipes.models import Ingredient
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время поиска ингредиентов по началу названия в индексе '
+        'в памяти и запросом IngredientFilter к базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries',
+            nargs='+',
+            help='Поисковые строки; по умолчанию начала названий из базы',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз повторить замер',
+        )
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or self._default_queries()
+        if not queries:
+            self.stdout.write('Нет ингредиентов для замера')
+            return
+        ingredient_index.build()
+        factory = APIRequestFactory()
+        view = IngredientViewSet()
+        requests = [
+            Request(factory.get('/api/ingredients/', {'name': query}))
+            for query in queries
+        ]
+        terms = [
+            IngredientFilter().get_search_terms(request)
+            for request in requests
+        ]
+
+        def search_index():
+            return [ingredient_index.search(query) for query in terms]
+
+        def search_database():
+            return [
+                list(IngredientFilter().filter_queryset(
+                    request, Ingredient.objects.all(), view
+                ).values(*INGREDIENT_FIELDS))
+                for request in requests
+            ]
+
+        repeat = options['repeat']
+        timings = {
+            'индекс в памяти': self._measure(search_index, repeat),
+            'запрос к базе': self._measure(search_database, repeat),
+        }
+        for label, seconds in timings.items():
+            self.stdout.write(
+                f'{label}: {seconds * 1000 * 1000 / len(queries):.1f} мкс '
+                f'на запрос'
+            )
+
+    @staticmethod
+    def _default_queries():
+        names = Ingredient.objects.order_by('id').values_list(
+            'name', flat=True
+        )[:100]
+        return sorted({
+            name[:length] for name in names for length in (1, 2, 3) if name
+        })
+
+    @staticmethod
+    def _measure(func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
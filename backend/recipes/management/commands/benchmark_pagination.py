@@ -0,0 +1,115 @@
+import time
+from urllib.parse import parse_qs, urlparse
+
+from api.pagination import IdCursorPagination
+from api.views import RecipeViewSet
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Recipe
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIRequestFactory
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Добавляет рецепты во временной транзакции и сравнивает время '
+        'открытия последней страницы списка рецептов по номеру страницы и '
+        'по курсору'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 50000],
+            help='Сколько рецептов должно быть в базе на каждом шаге',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=6,
+            help='Размер страницы',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз повторить замер',
+        )
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Хост для абсолютных ссылок',
+        )
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory(SERVER_NAME=options['host'])
+        view = RecipeViewSet.as_view({'get': 'list'})
+        limit = options['limit']
+        with transaction.atomic():
+            author, _ = User.objects.get_or_create(
+                username='benchmark-pagination',
+                defaults={'email': 'benchmark-pagination@example.com'}
+            )
+            for size in sorted(options['sizes']):
+                missing = size - Recipe.objects.count()
+                Recipe.objects.bulk_create(
+                    (
+                        Recipe(
+                            author=author,
+                            name=f'Рецепт {number}',
+                            text='Текст',
+                            cooking_time=10
+                        )
+                        for number in range(max(missing, 0))
+                    ),
+                    batch_size=1000
+                )
+                last_page = max(-(-Recipe.objects.count() // limit), 1)
+                position = Recipe.objects.order_by('id').values_list(
+                    'id', flat=True
+                )[limit:limit + 1].first()
+                timings = {
+                    'номер страницы': self._measure(
+                        view,
+                        factory.get(
+                            '/api/recipes/',
+                            {'page': last_page, 'limit': limit}
+                        ),
+                        options['repeat']
+                    ),
+                    'курсор': self._measure(
+                        view,
+                        factory.get('/api/recipes/', {
+                            'cursor': self._cursor(position),
+                            'limit': limit,
+                        }),
+                        options['repeat']
+                    ),
+                }
+                self.stdout.write(f'{size} рецептов: ' + ', '.join(
+                    f'{label} {seconds * 1000:.1f} мс'
+                    for label, seconds in timings.items()
+                ))
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _cursor(position):
+        paginator = IdCursorPagination()
+        paginator.base_url = ''
+        url = paginator.encode_cursor(
+            Cursor(offset=0, reverse=False, position=str(position))
+        )
+        return parse_qs(urlparse(url).query)[paginator.cursor_query_param][0]
+
+    @staticmethod
+    def _measure(view, request, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            view(request).render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
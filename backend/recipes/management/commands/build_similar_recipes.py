@@ -0,0 +1,86 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from recipes.models import Recipe, SimilarRecipe
+from recipes.similarity import RecipeVectors, store
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассчитывает похожие рецепты по ингредиентам и тэгам. По умолчанию '
+        'пересчитывает только рецепты, изменённые после прошлого запуска'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать все рецепты',
+        )
+        parser.add_argument(
+            '--top', type=int, default=settings.SIMILAR_RECIPES_COUNT
+        )
+        parser.add_argument(
+            '--tag-weight',
+            type=float,
+            default=0.5,
+            help='Вес тэга относительно ингредиента',
+        )
+        parser.add_argument(
+            '--max-df',
+            type=float,
+            default=0.5,
+            help='Ингредиенты и тэги, встречающиеся в большей доле '
+                 'рецептов, не учитываются',
+        )
+        parser.add_argument(
+            '--block-pairs',
+            type=int,
+            default=5000000,
+            help='Сколько пар рецептов сравнивать за один блок; '
+                 'ограничивает расход памяти',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        computed_at = timezone.now()
+        since = None
+        if not options['full']:
+            since = SimilarRecipe.objects.aggregate(
+                last=Max('computed_at')
+            )['last']
+        if since is not None:
+            changed_ids = list(Recipe.objects.filter(
+                updated_at__gt=since
+            ).values_list('id', flat=True).iterator())
+            if not changed_ids:
+                self.stdout.write('Изменённых рецептов нет')
+                return
+        vectors = RecipeVectors.load(options['tag_weight'], options['max_df'])
+        if since is None:
+            rows = np.arange(len(vectors.recipe_ids))
+        else:
+            rows = np.sort(vectors.rows(changed_ids))
+        changed = np.zeros(len(vectors.recipe_ids), dtype=bool)
+        changed[rows] = True
+        done = 0
+        for block in vectors.blocks(rows, options['block_pairs']):
+            scores = vectors.scores(block)
+            with transaction.atomic():
+                store(vectors.top_k(block, scores, options['top']),
+                      computed_at)
+                if since is not None:
+                    store(vectors.merge_into_neighbours(
+                        block, scores, changed, options['top']
+                    ), computed_at)
+            done += len(block)
+            self.stdout.write(f'Обработано рецептов: {done} из {len(rows)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты рассчитаны для {len(rows)} рецептов '
+            f'за {time.monotonic() - started:.2f} с'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Готовит уменьшенные WebP/JPEG варианты картинок рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать варианты, даже если они актуальны',
+        )
+
+    def handle(self, *args, **options):
+        generated = 0
+        recipe_ids = Recipe.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('id', flat=True)
+        for recipe_id in recipe_ids.iterator():
+            generated += generate_variants(recipe_id, force=options['force'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлены картинки рецептов: {generated}'
+        ))
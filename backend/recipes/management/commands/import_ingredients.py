@@ -1,19 +1,158 @@
+import csv
 import json
+import re
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from api.ingredient_index import ingredient_index
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipes.models import Ingredient
 
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class RowsReader:
+    def __init__(self, rows):
+        writer = csv.writer(Echo())
+        self._lines = (writer.writerow(row) for row in rows)
+        self._buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    readline = read
+
+
+def read_json(file, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов')
+    position = 1
+    eof = False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Некорректный JSON')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if not row:
+            continue
+        if len(row) != 2:
+            raise CommandError(f'Некорректная строка CSV: {row}')
+        if row == ['name', 'measurement_unit']:
+            continue
+        yield row[0], row[1]
+
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из JSON или CSV файла'
 
     def add_arguments(self, parser):
-        parser.add_argument('/foodgram', type=str)
+        parser.add_argument('path', type=str)
+        parser.add_argument(
+            '--format',
+            choices=('json', 'csv'),
+            help='Формат файла, по умолчанию определяется по расширению',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загрузка через COPY (только PostgreSQL)',
+        )
 
     def handle(self, *args, **options):
-        with open(options['/foodgram'], encoding="utf8") as f:
-            data = json.load(f)
-        for item in data:
-            Ingredient.objects.create(
-                name=item['name'],
-                measurement_unit=item['measurement_unit']
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        readers = {'json': read_json, 'csv': read_csv}
+        if file_format not in readers:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy доступен только для PostgreSQL')
+
+        started = time.monotonic()
+        before = Ingredient.objects.count()
+        with open(path, encoding='utf8', newline='') as file:
+            rows = readers[file_format](file)
+            if options['copy']:
+                total = self._copy(rows)
+            else:
+                total = self._bulk_create(rows, options['batch_size'])
+        created = Ingredient.objects.count() - before
+        ingredient_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {total}, добавлено ингредиентов: {created} '
+            f'за {time.monotonic() - started:.2f} с'
+        ))
+
+    def _bulk_create(self, rows, batch_size):
+        total = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return total
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ),
+                ignore_conflicts=True
+            )
+            total += len(batch)
+            self.stdout.write(f'Обработано строк: {total}')
+
+    def _copy(self, rows):
+        counter = {'total': 0}
+
+        def counted(rows):
+            for row in rows:
+                counter['total'] += 1
+                yield row
+
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                RowsReader(counted(rows))
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
             )
+        return counter['total']
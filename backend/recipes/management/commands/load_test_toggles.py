@@ -0,0 +1,152 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Favourite, Recipe
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+MODES = (
+    ('wsgi', 'foodgram.wsgi:application', 'sync', 'False'),
+    ('asgi', 'foodgram.asgi:application', 'uvicorn.workers.UvicornWorker',
+     'True'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает gunicorn с синхронными и с uvicorn воркерами и сравнивает '
+        'запросы в секунду и p99 для добавления и удаления из избранного'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Число воркеров gunicorn в обоих режимах',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Сколько запросов отправить в каждом режиме',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Сколько запросов выполняется одновременно',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8100,
+            help='Порт, на котором запускается сервер',
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        )[:options['concurrency']])
+        if not recipe_ids:
+            raise CommandError('Нет рецептов для нагрузки')
+        user, _ = User.objects.get_or_create(
+            username='load-test',
+            defaults={'email': 'load-test@example.com'}
+        )
+        key = Token.objects.get_or_create(user=user)[0].key
+        for mode, app, worker_class, async_toggles in MODES:
+            Favourite.objects.filter(user=user).delete()
+            server = self._start(
+                app, worker_class, async_toggles, options['workers'],
+                options['port']
+            )
+            try:
+                latencies, errors, elapsed = self._load(
+                    options['port'], key, recipe_ids,
+                    options['requests'], options['concurrency']
+                )
+            finally:
+                server.terminate()
+                server.wait()
+            latencies.sort()
+            self.stdout.write(
+                f'{mode}: {len(latencies) / elapsed:.0f} запросов/с, '
+                f'p50 {self._percentile(latencies, 0.5):.1f} мс, '
+                f'p99 {self._percentile(latencies, 0.99):.1f} мс, '
+                f'ошибок {errors}'
+            )
+        Favourite.objects.filter(user=user).delete()
+
+    def _start(self, app, worker_class, async_toggles, workers, port):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+            ASYNC_TOGGLES=async_toggles,
+        )
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', app,
+                '--worker-class', worker_class,
+                '--workers', str(workers),
+                '--bind', f'127.0.0.1:{port}',
+                '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn завершился: {app}')
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+            except OSError:
+                time.sleep(0.2)
+            else:
+                return server
+        server.terminate()
+        raise CommandError(f'gunicorn не запустился: {app}')
+
+    def _load(self, port, key, recipe_ids, count, concurrency):
+        headers = {'Authorization': f'Token {key}'}
+
+        def client(number):
+            connection = HTTPConnection('127.0.0.1', port, timeout=30)
+            path = (
+                f'/api/recipes/{recipe_ids[number % len(recipe_ids)]}'
+                f'/favorite/'
+            )
+            latencies, errors = [], 0
+            for request in range(number, count, concurrency):
+                method = 'DELETE' if request // concurrency % 2 else 'POST'
+                start = time.perf_counter()
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status >= 300:
+                    errors += 1
+            connection.close()
+            return latencies, errors
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(client, range(concurrency)))
+        elapsed = time.perf_counter() - start
+        return (
+            [latency for latencies, _ in results for latency in latencies],
+            sum(errors for _, errors in results),
+            elapsed,
+        )
+
+    @staticmethod
+    def _percentile(values, share):
+        return values[min(len(values) - 1, int(len(values) * share))]
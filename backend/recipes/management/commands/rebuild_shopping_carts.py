@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from recipes.models import IngredientRecipe, ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает агрегированные списки покупок пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = {
+                (row['recipe__shopping_lists__user'], row['ingredient']):
+                    row['total']
+                for row in IngredientRecipe.objects.filter(
+                    recipe__shopping_lists__isnull=False
+                ).values(
+                    'recipe__shopping_lists__user', 'ingredient'
+                ).annotate(total=Sum('amount')).order_by().iterator()
+            }
+            actual = {
+                (row.user_id, row.ingredient_id): row
+                for row in ShoppingCartIngredient.objects.select_for_update()
+            }
+            to_delete = [
+                row.pk for key, row in actual.items() if key not in expected
+            ]
+            to_update = []
+            to_create = []
+            for (user_id, ingredient_id), total in expected.items():
+                row = actual.get((user_id, ingredient_id))
+                if row is None:
+                    to_create.append(ShoppingCartIngredient(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=total
+                    ))
+                elif row.amount != total:
+                    row.amount = total
+                    to_update.append(row)
+
+            mismatches = len(to_delete) + len(to_update) + len(to_create)
+            self.stdout.write(
+                f'Лишних строк: {len(to_delete)}, '
+                f'неверных сумм: {len(to_update)}, '
+                f'недостающих строк: {len(to_create)}'
+            )
+            if options['check']:
+                if mismatches:
+                    raise CommandError('Списки покупок расходятся с корзинами')
+                return
+            ShoppingCartIngredient.objects.filter(pk__in=to_delete).delete()
+            ShoppingCartIngredient.objects.bulk_update(
+                to_update, ('amount',), batch_size=1000
+            )
+            ShoppingCartIngredient.objects.bulk_create(
+                to_create, batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересчитаны'))
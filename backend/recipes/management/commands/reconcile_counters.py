@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favourite, Recipe, ShoppingList
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favourites_count', Favourite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingList, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики рецептов и авторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        with transaction.atomic():
+            for model, field, related, foreign_key in COUNTERS:
+                expected = Coalesce(Subquery(
+                    related.objects.filter(
+                        **{foreign_key: OuterRef('pk')}
+                    ).order_by().values(foreign_key).annotate(
+                        total=Count('pk')
+                    ).values('total')
+                ), 0)
+                drifted = list(
+                    model.objects.select_for_update().annotate(
+                        expected=expected
+                    ).exclude(**{field: F('expected')}).values_list(
+                        'pk', flat=True
+                    )
+                )
+                mismatches += len(drifted)
+                self.stdout.write(
+                    f'{model._meta.model_name}.{field}: '
+                    f'расхождений {len(drifted)}'
+                )
+                if drifted and not options['check']:
+                    model.objects.filter(pk__in=drifted).update(
+                        **{field: expected}
+                    )
+        if options['check']:
+            if mismatches:
+                raise CommandError('Счётчики расходятся с данными')
+            return
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.3 on 2026-10-18 16:58
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for group in duplicates:
+        extra = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit'],
+        ).exclude(id=group['keep']).values_list('id', flat=True))
+        for model, owner in (
+            (IngredientRecipe, 'recipe_id'),
+            (ShoppingCartIngredient, 'user_id'),
+        ):
+            for row in model.objects.filter(ingredient_id__in=extra):
+                kept = model.objects.filter(
+                    ingredient_id=group['keep'],
+                    **{owner: getattr(row, owner)}
+                ).first()
+                if kept is None:
+                    row.ingredient_id = group['keep']
+                    row.save(update_fields=['ingredient'])
+                    continue
+                kept.amount += row.amount
+                kept.save(update_fields=['amount'])
+                row.delete()
+        Ingredient.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shoppingcartingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('card', 'Карточка'), ('detail', 'Страница рецепта')], max_length=16, verbose_name='Вариант')),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=16, verbose_name='Формат')),
+                ('source', models.CharField(max_length=200, verbose_name='Исходная картинка')),
+                ('image', models.ImageField(height_field='height', upload_to='recipes/variants', verbose_name='Картинка', width_field='width')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_variants', to='recipes.recipe')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='recipeimage',
+            constraint=models.UniqueConstraint(fields=('recipe', 'kind', 'format'), name='unique_recipe_image'),
+        ),
+    ]
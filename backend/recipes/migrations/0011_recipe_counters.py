@@ -0,0 +1,45 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:10
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Recipe', 'favourites_count', 'recipes', 'Favourite', 'recipe'),
+    ('recipes', 'Recipe', 'in_carts_count', 'recipes', 'ShoppingList', 'recipe'),
+    ('users', 'User', 'recipes_count', 'recipes', 'Recipe', 'author'),
+    ('users', 'User', 'followers_count', 'users', 'Follow', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, model, field, related_app, related, foreign_key in COUNTERS:
+        rows = apps.get_model(related_app, related).objects.filter(
+            **{foreign_key: models.OuterRef('pk')}
+        ).order_by().values(foreign_key).annotate(
+            total=models.Count('pk')
+        ).values('total')
+        apps.get_model(app, model).objects.update(
+            **{field: Coalesce(models.Subquery(rows), 0)}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipeimage'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favourites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,236 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:05
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRESQL_INSTALL = (
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector(
+        recipe_name text, recipe_text text, recipe bigint
+    ) RETURNS tsvector LANGUAGE sql STABLE AS $$
+        SELECT setweight(to_tsvector('russian', coalesce($1, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce((
+                SELECT string_agg(ingredient.name, ' ')
+                FROM recipes_ingredientrecipe AS ingredient_recipe
+                JOIN recipes_ingredient AS ingredient
+                    ON ingredient.id = ingredient_recipe.ingredient_id
+                WHERE ingredient_recipe.recipe_id = $3
+            ), '')), 'B')
+            || setweight(to_tsvector('russian', coalesce($2, '')), 'C')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_trigger()
+    RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := recipes_recipe_search_vector(
+            NEW.name, NEW.text, NEW.id
+        );
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_search
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_trigger()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recipes_ingredientrecipe_search_trigger()
+    RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE recipes_recipe
+        SET search_vector = recipes_recipe_search_vector(name, text, id)
+        WHERE id IN (SELECT recipe_id FROM changed_rows);
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER recipes_ingredientrecipe_search_insert
+    AFTER INSERT ON recipes_ingredientrecipe
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE recipes_ingredientrecipe_search_trigger()
+    """,
+    """
+    CREATE TRIGGER recipes_ingredientrecipe_search_update
+    AFTER UPDATE ON recipes_ingredientrecipe
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE recipes_ingredientrecipe_search_trigger()
+    """,
+    """
+    CREATE TRIGGER recipes_ingredientrecipe_search_delete
+    AFTER DELETE ON recipes_ingredientrecipe
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE recipes_ingredientrecipe_search_trigger()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION recipes_ingredient_search_trigger()
+    RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE recipes_recipe
+        SET search_vector = recipes_recipe_search_vector(name, text, id)
+        WHERE id IN (
+            SELECT recipe_id FROM recipes_ingredientrecipe
+            WHERE ingredient_id = NEW.id
+        );
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER recipes_ingredient_search
+    AFTER UPDATE OF name ON recipes_ingredient
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE PROCEDURE recipes_ingredient_search_trigger()
+    """,
+    """
+    UPDATE recipes_recipe
+    SET search_vector = recipes_recipe_search_vector(name, text, id)
+    """,
+    """
+    CREATE INDEX recipes_recipe_search_vector
+    ON recipes_recipe USING gin (search_vector)
+    """,
+)
+
+POSTGRESQL_UNINSTALL = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector',
+    'DROP TRIGGER IF EXISTS recipes_ingredient_search ON recipes_ingredient',
+    'DROP TRIGGER IF EXISTS recipes_ingredientrecipe_search_insert '
+    'ON recipes_ingredientrecipe',
+    'DROP TRIGGER IF EXISTS recipes_ingredientrecipe_search_update '
+    'ON recipes_ingredientrecipe',
+    'DROP TRIGGER IF EXISTS recipes_ingredientrecipe_search_delete '
+    'ON recipes_ingredientrecipe',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_ingredient_search_trigger()',
+    'DROP FUNCTION IF EXISTS recipes_ingredientrecipe_search_trigger()',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_trigger()',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector(text, text, bigint)',
+)
+
+SQLITE_INGREDIENTS = """
+    coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_ingredientrecipe AS ingredient_recipe
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = ingredient_recipe.ingredient_id
+        WHERE ingredient_recipe.recipe_id = {}
+    ), '')
+"""
+
+SQLITE_INSTALL = (
+    """
+    CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(
+        name, ingredients, text, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_fts_insert
+    AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+        VALUES (NEW.id, NEW.name, '', NEW.text);
+    END
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+        UPDATE recipes_recipe_fts SET name = NEW.name, text = NEW.text
+        WHERE rowid = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_fts_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        DELETE FROM recipes_recipe_fts WHERE rowid = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER recipes_ingredientrecipe_fts_insert
+    AFTER INSERT ON recipes_ingredientrecipe BEGIN
+        UPDATE recipes_recipe_fts
+        SET ingredients = {SQLITE_INGREDIENTS.format('NEW.recipe_id')}
+        WHERE rowid = NEW.recipe_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER recipes_ingredientrecipe_fts_update
+    AFTER UPDATE ON recipes_ingredientrecipe BEGIN
+        UPDATE recipes_recipe_fts
+        SET ingredients = {SQLITE_INGREDIENTS.format('NEW.recipe_id')}
+        WHERE rowid = NEW.recipe_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER recipes_ingredientrecipe_fts_delete
+    AFTER DELETE ON recipes_ingredientrecipe BEGIN
+        UPDATE recipes_recipe_fts
+        SET ingredients = {SQLITE_INGREDIENTS.format('OLD.recipe_id')}
+        WHERE rowid = OLD.recipe_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER recipes_ingredient_fts_update
+    AFTER UPDATE OF name ON recipes_ingredient BEGIN
+        UPDATE recipes_recipe_fts
+        SET ingredients = {SQLITE_INGREDIENTS.format('recipes_recipe_fts.rowid')}
+        WHERE rowid IN (
+            SELECT recipe_id FROM recipes_ingredientrecipe
+            WHERE ingredient_id = NEW.id
+        );
+    END
+    """,
+    f"""
+    INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name,
+        {SQLITE_INGREDIENTS.format('recipe.id')}, recipe.text
+    FROM recipes_recipe AS recipe
+    """,
+)
+
+SQLITE_UNINSTALL = (
+    'DROP TRIGGER IF EXISTS recipes_ingredient_fts_update',
+    'DROP TRIGGER IF EXISTS recipes_ingredientrecipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_ingredientrecipe_fts_update',
+    'DROP TRIGGER IF EXISTS recipes_ingredientrecipe_fts_insert',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run(statements):
+    def execute(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement, params=None)
+    return execute
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_ingredient_name_prefix_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run({
+                'postgresql': POSTGRESQL_INSTALL,
+                'sqlite': SQLITE_INSTALL,
+            }),
+            run({
+                'postgresql': POSTGRESQL_UNINSTALL,
+                'sqlite': SQLITE_UNINSTALL,
+            }),
+        ),
+    ]
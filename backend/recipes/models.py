@@ -1,7 +1,25 @@
-from django.db import models
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+)
+from django.db import connection, connections, models, transaction
+from django.db.models import Case, F, Sum, Value, When, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, RowNumber
 from django.core.validators import MinValueValidator
+from django.dispatch import Signal
 from foodgram.settings import RECIPES_LENGTH
-from users.models import User
+from users.models import Follow, User
+
+SEARCH_CONFIG = 'russian'
+
+recipes_created = Signal()
+user_recipes_changed = Signal()
 
 
 class Ingredient(models.Model):
@@ -14,6 +32,14 @@ class Ingredient(models.Model):
         max_length=RECIPES_LENGTH
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
+
     def __str__(self):
         return self.name
 
@@ -38,6 +64,45 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def limit_per_author(self, limit):
+        sql, params = self.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=F('id').desc(),
+            )
+        ).values('id', 'row_number').query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE row_number <= %s',
+            (*params, limit)
+        ))
+
+    def search(self, query):
+        if connection.vendor == 'postgresql':
+            search_query = SearchQuery(
+                query, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            return self.filter(search_vector=search_query).annotate(
+                search_rank=SearchRank(F('search_vector'), search_query)
+            ).order_by('-search_rank', '-id')
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return self.none()
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return self.extra(
+            select={
+                'search_rank': '-bm25(recipes_recipe_fts, 10.0, 5.0, 1.0)',
+            },
+            tables=['recipes_recipe_fts'],
+            where=[
+                'recipes_recipe_fts.rowid = recipes_recipe.id',
+                'recipes_recipe_fts MATCH %s',
+            ],
+            params=[match],
+        ).order_by('-search_rank', '-id')
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -64,6 +129,71 @@ class Recipe(models.Model):
         related_name='recipes',
     )
     cooking_time = models.IntegerField('Время приготовления')
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    favourites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок', default=0, editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-id',)
+        indexes = [
+            models.Index(
+                fields=['author', '-id'], name='recipe_author_id_desc'
+            ),
+        ]
+
+    def get_image(self, kind, image_format):
+        for variant in self.image_variants.all():
+            if (variant.kind == kind and variant.format == image_format
+                    and variant.source == self.image.name):
+                return variant.image
+        return self.image
+
+
+class RecipeImage(models.Model):
+    CARD = 'card'
+    DETAIL = 'detail'
+    KINDS = (
+        (CARD, 'Карточка'),
+        (DETAIL, 'Страница рецепта'),
+    )
+    WEBP = 'webp'
+    JPEG = 'jpeg'
+    FORMATS = (
+        (WEBP, 'WebP'),
+        (JPEG, 'JPEG'),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_variants'
+    )
+    kind = models.CharField('Вариант', max_length=16, choices=KINDS)
+    format = models.CharField('Формат', max_length=16, choices=FORMATS)
+    source = models.CharField('Исходная картинка', max_length=RECIPES_LENGTH)
+    image = models.ImageField(
+        'Картинка',
+        upload_to='recipes/variants',
+        width_field='width',
+        height_field='height'
+    )
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'kind', 'format'],
+                name='unique_recipe_image'
+            )
+        ]
 
 
 class IngredientRecipe(models.Model):
@@ -89,6 +219,47 @@ class IngredientRecipe(models.Model):
         ]
 
 
+class UserRecipeManager(models.Manager):
+    def add(self, user_id, recipe_ids):
+        return self._change(
+            'INSERT INTO {table} (user_id, recipe_id) '
+            'SELECT %s, id FROM {recipes} WHERE id IN ({ids}) '
+            'ON CONFLICT (user_id, recipe_id) DO NOTHING '
+            'RETURNING recipe_id',
+            user_id, recipe_ids, 1
+        )
+
+    def remove(self, user_id, recipe_ids):
+        return self._change(
+            'DELETE FROM {table} WHERE user_id = %s AND recipe_id IN ({ids}) '
+            'RETURNING recipe_id',
+            user_id, recipe_ids, -1
+        )
+
+    def _change(self, sql, user_id, recipe_ids, delta):
+        recipe_ids = sorted(set(recipe_ids))
+        if not recipe_ids:
+            return []
+        connection = connections[self.db]
+        sql = sql.format(
+            table=connection.ops.quote_name(self.model._meta.db_table),
+            recipes=connection.ops.quote_name(Recipe._meta.db_table),
+            ids=', '.join(['%s'] * len(recipe_ids))
+        )
+        with transaction.atomic(using=self.db):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [user_id, *recipe_ids])
+                changed = [row[0] for row in cursor.fetchall()]
+            if changed:
+                user_recipes_changed.send(
+                    sender=self.model,
+                    user_id=user_id,
+                    recipe_ids=changed,
+                    delta=delta
+                )
+        return changed
+
+
 class ShoppingList(models.Model):
     user = models.ForeignKey(
         User,
@@ -101,6 +272,8 @@ class ShoppingList(models.Model):
         related_name='shopping_lists'
     )
 
+    objects = UserRecipeManager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -122,6 +295,8 @@ class Favourite(models.Model):
         related_name='favourites'
     )
 
+    objects = UserRecipeManager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -129,3 +304,217 @@ class Favourite(models.Model):
                 name='already_in_favorites'
             )
         ]
+
+
+class ShoppingCartIngredientManager(models.Manager):
+    def apply_amounts(self, user_ids, amounts, sign=1):
+        user_ids = sorted(set(user_ids))
+        amounts = {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in sorted(amounts.items()) if amount
+        }
+        if not user_ids or not amounts:
+            return
+        with transaction.atomic(using=self.db):
+            self.bulk_create(
+                (
+                    self.model(
+                        user_id=user_id, ingredient_id=ingredient_id, amount=0
+                    )
+                    for user_id in user_ids
+                    for ingredient_id, amount in amounts.items() if amount > 0
+                ),
+                ignore_conflicts=True
+            )
+            rows = self.filter(
+                user_id__in=user_ids, ingredient_id__in=amounts
+            )
+            rows.update(amount=Greatest(F('amount') + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(amount))
+                    for ingredient_id, amount in amounts.items()
+                ),
+                output_field=models.IntegerField()
+            ), 0))
+            rows.filter(amount=0).delete()
+
+    def add_recipes(self, user_id, recipe_ids, sign=1):
+        amounts = dict(IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total'))
+        self.apply_amounts((user_id,), amounts, sign)
+
+    def add_recipe(self, user_id, recipe_id, sign=1):
+        self.add_recipes(user_id, (recipe_id,), sign)
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.add_recipe(user_id, recipe_id, sign=-1)
+
+    def change_recipe(self, recipe_id, amounts, sign=1):
+        self.apply_amounts(
+            ShoppingList.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('user_id', flat=True),
+            amounts,
+            sign
+        )
+
+
+class ShoppingCartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+    )
+    amount = models.PositiveIntegerField(default=0)
+
+    objects = ShoppingCartIngredientManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_ingredient'
+            )
+        ]
+
+
+class TimelineManager(models.Manager):
+    def _add(self, user_ids, recipe_ids, author_id):
+        self.bulk_create(
+            (
+                self.model(
+                    user_id=user_id, recipe_id=recipe_id, author_id=author_id
+                )
+                for user_id in user_ids for recipe_id in recipe_ids
+            ),
+            ignore_conflicts=True
+        )
+
+    @staticmethod
+    def fans_out(author):
+        return author.followers_count <= settings.FEED_FAN_OUT_LIMIT
+
+    def fan_out(self, recipe_id):
+        recipe = Recipe.objects.select_related('author').filter(
+            pk=recipe_id
+        ).first()
+        if recipe is None or not self.fans_out(recipe.author):
+            return 0
+        followers = Follow.objects.filter(
+            author_id=recipe.author_id
+        ).values_list('user_id', flat=True).iterator(
+            chunk_size=settings.FEED_FAN_OUT_BATCH_SIZE
+        )
+        total = 0
+        while True:
+            batch = list(islice(followers, settings.FEED_FAN_OUT_BATCH_SIZE))
+            if not batch:
+                return total
+            self._add(batch, (recipe.pk,), recipe.author_id)
+            total += len(batch)
+
+    def backfill(self, user_id, author):
+        if not self.fans_out(author):
+            return
+        self._add(
+            (user_id,),
+            Recipe.objects.filter(author=author).order_by(
+                '-id'
+            ).values_list('id', flat=True)[:settings.FEED_BACKFILL_SIZE],
+            author.pk
+        )
+
+    def trim(self, user_id, author_id):
+        self.filter(user_id=user_id, author_id=author_id).delete()
+
+    def recipe_ids(self, user_id, before=None, limit=None):
+        entries = self.filter(user_id=user_id)
+        if before is not None:
+            entries = entries.filter(recipe_id__lt=before)
+        ids = set(entries.order_by('-recipe_id').values_list(
+            'recipe_id', flat=True
+        )[:limit])
+        authors = list(Follow.objects.filter(
+            user_id=user_id,
+            author__followers_count__gt=settings.FEED_FAN_OUT_LIMIT
+        ).values_list('author_id', flat=True))
+        if authors:
+            recipes = Recipe.objects.filter(author_id__in=authors)
+            if before is not None:
+                recipes = recipes.filter(pk__lt=before)
+            ids.update(recipes.order_by('-id').values_list(
+                'id', flat=True
+            )[:limit])
+        return sorted(ids, reverse=True)[:limit]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False
+    )
+
+    objects = TimelineManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author'
+            ),
+        ]
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        db_index=False
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField('Сходство')
+    computed_at = models.DateTimeField('Дата расчёта')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='similar_recipe_score'
+            ),
+        ]
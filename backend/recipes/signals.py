@@ -0,0 +1,141 @@
+from collections import Counter
+
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from recipes.images import schedule_variants
+from recipes.models import (
+    Favourite,
+    Recipe,
+    ShoppingCartIngredient,
+    ShoppingList,
+    TimelineEntry,
+    recipes_created,
+    user_recipes_changed,
+)
+from recipes.timeline import schedule_fan_out
+from users.models import Follow, User
+
+
+@receiver(post_save, sender=Recipe)
+def prepare_image_variants(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        schedule_variants(instance.pk)
+
+
+@receiver(recipes_created, sender=Recipe)
+def prepare_created_image_variants(sender, recipes, **kwargs):
+    for recipe in recipes:
+        if recipe.image:
+            schedule_variants(recipe.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        schedule_fan_out(instance.pk)
+
+
+@receiver(recipes_created, sender=Recipe)
+def fan_out_created_recipes(sender, recipes, **kwargs):
+    for recipe in recipes:
+        schedule_fan_out(recipe.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        TimelineEntry.objects.backfill(instance.user_id, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    TimelineEntry.objects.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=ShoppingList)
+def add_to_shopping_cart(sender, instance, created, **kwargs):
+    if created:
+        ShoppingCartIngredient.objects.add_recipe(
+            instance.user_id, instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingList)
+def remove_from_shopping_cart(sender, instance, **kwargs):
+    ShoppingCartIngredient.objects.remove_recipe(
+        instance.user_id, instance.recipe_id
+    )
+
+
+@receiver(user_recipes_changed, sender=ShoppingList)
+def change_shopping_cart(sender, user_id, recipe_ids, delta, **kwargs):
+    ShoppingCartIngredient.objects.add_recipes(user_id, recipe_ids, delta)
+
+
+def increment(model, pks, field, delta):
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(User, (instance.author_id,), 'recipes_count', 1)
+
+
+@receiver(recipes_created, sender=Recipe)
+def count_created_recipes(sender, recipes, **kwargs):
+    authors = Counter(recipe.author_id for recipe in recipes)
+    for author_id, count in authors.items():
+        increment(User, (author_id,), 'recipes_count', count)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    increment(User, (instance.author_id,), 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favourite)
+def count_created_favourite(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(Recipe, (instance.recipe_id,), 'favourites_count', 1)
+
+
+@receiver(post_delete, sender=Favourite)
+def count_deleted_favourite(sender, instance, **kwargs):
+    increment(Recipe, (instance.recipe_id,), 'favourites_count', -1)
+
+
+@receiver(user_recipes_changed, sender=Favourite)
+def count_changed_favourites(sender, recipe_ids, delta, **kwargs):
+    increment(Recipe, recipe_ids, 'favourites_count', delta)
+
+
+@receiver(post_save, sender=ShoppingList)
+def count_created_cart(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(Recipe, (instance.recipe_id,), 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingList)
+def count_deleted_cart(sender, instance, **kwargs):
+    increment(Recipe, (instance.recipe_id,), 'in_carts_count', -1)
+
+
+@receiver(user_recipes_changed, sender=ShoppingList)
+def count_changed_carts(sender, recipe_ids, delta, **kwargs):
+    increment(Recipe, recipe_ids, 'in_carts_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(User, (instance.author_id,), 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    increment(User, (instance.author_id,), 'followers_count', -1)
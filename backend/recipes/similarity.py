@@ -0,0 +1,167 @@
+from itertools import chain, islice
+
+import numpy as np
+from recipes.models import IngredientRecipe, Recipe, SimilarRecipe
+from scipy import sparse
+
+CHUNK_SIZE = 1000
+
+
+def _ids(queryset, *fields):
+    values = queryset.order_by().values_list(*fields).iterator(
+        chunk_size=10000
+    )
+    return np.fromiter(
+        chain.from_iterable(values), dtype=np.int64
+    ).reshape(-1, len(fields))
+
+
+def _positions(sorted_ids, ids):
+    rows = np.searchsorted(sorted_ids, ids)
+    found = rows < len(sorted_ids)
+    found[found] = sorted_ids[rows[found]] == ids[found]
+    return rows, found
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RecipeVectors:
+    def __init__(self, recipe_ids, matrix, cost):
+        self.recipe_ids = recipe_ids
+        self.matrix = matrix
+        self.transposed = matrix.T.tocsr()
+        self.cost = cost
+
+    @classmethod
+    def load(cls, tag_weight, max_df):
+        recipe_ids = _ids(Recipe.objects.all(), 'id')[:, 0]
+        ingredients = _ids(
+            IngredientRecipe.objects.all(), 'recipe_id', 'ingredient_id'
+        )
+        tags = _ids(Recipe.tags.through.objects.all(), 'recipe_id', 'tag_id')
+        ingredient_ids, ingredient_columns = np.unique(
+            ingredients[:, 1], return_inverse=True
+        )
+        tag_ids, tag_columns = np.unique(tags[:, 1], return_inverse=True)
+        rows, known = _positions(
+            recipe_ids, np.concatenate((ingredients[:, 0], tags[:, 0]))
+        )
+        columns = np.concatenate(
+            (ingredient_columns, tag_columns + len(ingredient_ids))
+        )
+        weights = np.concatenate((
+            np.ones(len(ingredients), dtype=np.float32),
+            np.full(len(tags), tag_weight, dtype=np.float32),
+        ))
+        matrix = sparse.csr_matrix(
+            (weights[known], (rows[known], columns[known])),
+            shape=(len(recipe_ids), len(ingredient_ids) + len(tag_ids)),
+            dtype=np.float32
+        )
+        frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        keep = np.flatnonzero(
+            (frequency > 0) & (frequency <= max_df * len(recipe_ids))
+        )
+        frequency = frequency[keep]
+        idf = np.log((1 + len(recipe_ids)) / (1 + frequency)) + 1
+        matrix = matrix[:, keep] @ sparse.diags(idf.astype(np.float32))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)))
+        norms[norms == 0] = 1
+        matrix = sparse.diags(1 / norms.ravel().astype(np.float32)) @ matrix
+        cost = (matrix != 0).astype(np.float32) @ frequency.astype(np.float32)
+        return cls(recipe_ids, matrix.tocsr(), cost)
+
+    def rows(self, recipe_ids):
+        rows, found = _positions(
+            self.recipe_ids, np.asarray(recipe_ids, dtype=np.int64)
+        )
+        return rows[found]
+
+    def blocks(self, rows, max_pairs):
+        start, pairs = 0, 0
+        for position, row in enumerate(rows):
+            if pairs and pairs + self.cost[row] > max_pairs:
+                yield rows[start:position]
+                start, pairs = position, 0
+            pairs += self.cost[row]
+        if start < len(rows):
+            yield rows[start:]
+
+    def scores(self, rows):
+        return (self.matrix[rows] @ self.transposed).tocsr()
+
+    def top_k(self, rows, scores, k):
+        for position, row in enumerate(rows):
+            start, end = scores.indptr[position], scores.indptr[position + 1]
+            columns = scores.indices[start:end]
+            values = scores.data[start:end]
+            other = columns != row
+            yield self.recipe_ids[row], *self._best(
+                self.recipe_ids[columns[other]], values[other], k
+            )
+
+    def merge_into_neighbours(self, rows, scores, changed, k):
+        block_ids = self.recipe_ids[rows]
+        scores = scores.T.tocsr()
+        neighbours = np.flatnonzero(np.diff(scores.indptr))
+        for chunk in _chunks(block_ids.tolist()):
+            neighbours = np.union1d(neighbours, self.rows(_ids(
+                SimilarRecipe.objects.filter(similar_id__in=chunk),
+                'recipe_id'
+            )[:, 0]))
+        neighbours = neighbours[~changed[neighbours]]
+        stale = set(block_ids.tolist())
+        for chunk in _chunks(neighbours.tolist()):
+            current = {int(self.recipe_ids[row]): {} for row in chunk}
+            for recipe_id, similar_id, score in SimilarRecipe.objects.filter(
+                recipe_id__in=list(current)
+            ).values_list('recipe_id', 'similar_id', 'score'):
+                if similar_id not in stale:
+                    current[recipe_id][similar_id] = score
+            for row in chunk:
+                merged = current[int(self.recipe_ids[row])]
+                start, end = scores.indptr[row], scores.indptr[row + 1]
+                merged.update(zip(
+                    block_ids[scores.indices[start:end]].tolist(),
+                    scores.data[start:end].tolist()
+                ))
+                yield self.recipe_ids[row], *self._best(
+                    np.fromiter(merged, dtype=np.int64, count=len(merged)),
+                    np.fromiter(
+                        merged.values(), dtype=np.float32, count=len(merged)
+                    ),
+                    k
+                )
+
+    @staticmethod
+    def _best(recipe_ids, scores, k):
+        if len(scores) > k:
+            best = scores >= np.partition(scores, len(scores) - k)[-k]
+            recipe_ids, scores = recipe_ids[best], scores[best]
+        order = np.lexsort((-recipe_ids, -scores))[:k]
+        return recipe_ids[order], scores[order]
+
+
+def store(results, computed_at):
+    for chunk in _chunks(results):
+        SimilarRecipe.objects.filter(
+            recipe_id__in=[int(recipe_id) for recipe_id, _, _ in chunk]
+        ).delete()
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(
+                recipe_id=int(recipe_id),
+                similar_id=similar_id,
+                score=score,
+                computed_at=computed_at
+            )
+            for recipe_id, similar_ids, scores in chunk
+            for similar_id, score in zip(similar_ids.tolist(), scores.tolist())
+            if score > 0
+        )
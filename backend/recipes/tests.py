@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.test import TestCase
+from recipes.models import (
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCartIngredient,
+    ShoppingCartIngredientManager,
+    ShoppingList,
+)
+from users.models import User
+
+
+class IngredientRecipeAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password'
+        )
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        cls.salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        cls.sugar = Ingredient.objects.create(
+            name='Сахар', measurement_unit='г'
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Текст', cooking_time=10
+        )
+        cls.ingredient_recipe = IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=cls.salt, amount=5
+        )
+        ShoppingList.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = (
+            f'/admin/recipes/ingredientrecipe/{self.ingredient_recipe.pk}/'
+        )
+
+    def cart(self):
+        return dict(ShoppingCartIngredient.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'amount'))
+
+    def test_change_updates_carts(self):
+        self.assertEqual(self.cart(), {self.salt.pk: 5})
+        response = self.client.post(f'{self.url}change/', {
+            'recipe': self.ingredient_recipe.recipe_id,
+            'ingredient': self.sugar.pk,
+            'amount': 7,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.cart(), {self.sugar.pk: 7})
+
+    def test_delete_updates_carts(self):
+        response = self.client.post(f'{self.url}delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.cart(), {})
+
+
+class ShoppingCartIngredientTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password'
+        )
+        cls.salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        cls.sugar = Ingredient.objects.create(
+            name='Сахар', measurement_unit='г'
+        )
+
+    def cart(self):
+        return dict(ShoppingCartIngredient.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'amount'))
+
+    def apply(self, amounts, sign=1):
+        ShoppingCartIngredient.objects.apply_amounts(
+            (self.user.pk,), amounts, sign
+        )
+
+    def test_amounts_are_added_and_removed(self):
+        self.apply({self.salt.pk: 5})
+        self.apply({self.salt.pk: 2, self.sugar.pk: 3})
+        self.assertEqual(self.cart(), {self.salt.pk: 7, self.sugar.pk: 3})
+        self.apply({self.salt.pk: 7, self.sugar.pk: 1}, -1)
+        self.assertEqual(self.cart(), {self.sugar.pk: 2})
+        self.apply({self.salt.pk: 1}, -1)
+        self.assertEqual(self.cart(), {self.sugar.pk: 2})
+
+    def test_row_inserted_concurrently_is_incremented(self):
+        bulk_create = ShoppingCartIngredientManager.bulk_create
+
+        def racing_bulk_create(manager, objs, **kwargs):
+            ShoppingCartIngredient.objects.create(
+                user=self.user, ingredient=self.salt, amount=4
+            )
+            return bulk_create(manager, objs, **kwargs)
+
+        with mock.patch.object(
+            ShoppingCartIngredientManager, 'bulk_create', racing_bulk_create
+        ):
+            self.apply({self.salt.pk: 5})
+        self.assertEqual(self.cart(), {self.salt.pk: 9})
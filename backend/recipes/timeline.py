@@ -0,0 +1,26 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from recipes.models import TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=settings.FEED_FAN_OUT_WORKERS)
+
+
+def _fan_out_in_background(recipe_id):
+    try:
+        TimelineEntry.objects.fan_out(recipe_id)
+    except Exception:
+        logger.exception('Не удалось разослать рецепт %s в ленты подписчиков',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_fan_out(recipe_id):
+    transaction.on_commit(
+        lambda: executor.submit(_fan_out_in_background, recipe_id)
+    )
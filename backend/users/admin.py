@@ -14,7 +14,8 @@ class UserAdmin(admin.ModelAdmin):
         'last_name',
         'email',
     )
-    list_filter = ('email', 'username',)
+    search_fields = ('^username', '^email')
+    ordering = ('id',)
 
 
 admin.site.register(User, UserAdmin)
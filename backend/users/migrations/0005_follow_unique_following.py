@@ -0,0 +1,41 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:40
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    User = apps.get_model('users', 'User')
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        first=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    authors = set()
+    for duplicate in duplicates:
+        Follow.objects.filter(
+            user=duplicate['user'], author=duplicate['author']
+        ).exclude(id=duplicate['first']).delete()
+        authors.add(duplicate['author'])
+    for author_id in authors:
+        User.objects.filter(id=author_id).update(
+            followers_count=Follow.objects.filter(author=author_id).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_follow_user_author_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='follow_user_author',
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_following'),
+        ),
+    ]
@@ -12,6 +12,12 @@ class User(AbstractUser):
         unique=True
     )
     password = models.CharField('Пароль', max_length=100)
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов', default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков', default=0, editable=False
+    )
 
     def __str__(self):
         return self.username
@@ -32,10 +38,12 @@ class Follow(models.Model):
     )
 
     class Meta:
-        models.UniqueConstraint(
-            fields=['user', 'author'],
-            name='unique_following',
-        )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_following',
+            )
+        ]
 
     def __str__(self) -> str:
         return f"{self.user} подписан на {self.author}"